@@ -0,0 +1,336 @@
+import itertools
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import Integer, and_, cast, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from app.cache import table_versions
+from app.config import settings
+from app.instrumentation import statements_not_counted
+from app.models import models
+
+SNAPSHOT_CHUNK_ROWS = 100_000
+
+# Sales committed out of id order (a transaction that took its id before a
+# later one but committed after it) are caught by re-reading this many ids
+# below the highest id held on every incremental load
+SNAPSHOT_LOOKBACK_IDS = 10_000
+
+EPOCH = date(1970, 1, 1)
+
+# Column dtypes: day is days since 1970-01-01, revenue (quantity x unit
+# price) is in cents
+COLUMNS = {
+    "id": np.int64,
+    "product_id": np.int32,
+    "day": np.int32,
+    "quantity": np.int32,
+    "revenue": np.int64,
+}
+
+
+def day_number(day: date) -> int:
+    return (day - EPOCH).days
+
+
+def from_day_number(number: int) -> date:
+    return EPOCH + timedelta(days=int(number))
+
+
+def day_number_column(column, dialect: str):
+    # Days since 1970-01-01 computed by the database, which is several times
+    # faster to load than converting a datetime per row
+    if dialect == "mysql":
+        return func.to_days(column) - 719528  # TO_DAYS('1970-01-01')
+    if dialect == "sqlite":
+        return cast(func.julianday(func.date(column)) - 2440587.5, Integer)  # julianday('1970-01-01')
+    raise NotImplementedError(f"Sales snapshot is not supported on {dialect}")
+
+
+def archived_last_ids(columns: dict, archived: tuple) -> np.ndarray:
+    # Per row, the last archived id of the archived period (start, end,
+    # last_id) the row's day falls in, or -1
+    last_ids = np.full(len(columns["id"]), -1, np.int64)
+    for start, end, last_id in archived:
+        in_period = columns["day"] < day_number(end.date())
+        if start:
+            in_period &= columns["day"] >= day_number(start.date())
+        last_ids[in_period] = last_id
+    return last_ids
+
+
+def _to_columns(rows) -> dict:
+    # Integer rows in COLUMNS order to one array per column
+    table = np.fromiter(itertools.chain.from_iterable(rows), np.int64, len(rows) * len(COLUMNS)) \
+        .reshape(len(rows), len(COLUMNS))
+    return {name: table[:, i].astype(dtype) for i, (name, dtype) in enumerate(COLUMNS.items())}
+
+
+def _select(columns: dict, mask: np.ndarray) -> dict:
+    return {name: array[mask] for name, array in columns.items()}
+
+
+# ---------- Sales snapshot ----------
+
+class SalesSnapshot:
+    # The sales facts as one NumPy array per column, about 28 bytes per sale.
+    # Loaded on first use, then extended with the sales committed since: at
+    # once after a sale in this process (the "sales" table version changed),
+    # and every ANALYTICS_SNAPSHOT_TTL_SECONDS for sales from other workers.
+    # When `python -m app.partitions archive` records a new period in
+    # sales_archives, the snapshot is loaded again in full. Archived periods
+    # are then read from sales_daily_product, one row per product and day
+    # with id 0, and their archived sales are left out even while they are
+    # still being deleted.
+    #
+    # Loads run without the lock, which is only taken to swap or append. One
+    # load runs at a time: requests arriving meanwhile use the snapshot as it
+    # is, or wait for the first load. Callers must not be on the event loop
+    # thread (the analytics routes refresh from a worker thread with their
+    # own connection), or a wait would stop the load it waits for. Arrays
+    # grow by doubling, so appends are amortized O(1); readers get views of
+    # the filled prefix and never see a partial append.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+        self._arrays = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self._size = 0
+        self._max_id = 0
+        self._version = None
+        self._archived = None
+        self._loaded_at = None
+        self._loading = False
+
+    def _stale(self, version) -> bool:
+        return self._loaded_at is None or version != self._version \
+            or time.monotonic() - self._loaded_at >= settings.ANALYTICS_SNAPSHOT_TTL_SECONDS
+
+    def refresh(self, db: Session):
+        version = table_versions.snapshot().get("sales", 0)
+        with self._loaded:
+            while self._loading and self._loaded_at is None:
+                self._loaded.wait()
+            if self._loading or not self._stale(version):
+                return
+            self._loading = True
+            loaded = self._loaded_at is not None
+            archived, max_id = self._archived, self._max_id
+
+        try:
+            with statements_not_counted():
+                now_archived = tuple(db.execute(select(
+                    models.SalesArchive.start, models.SalesArchive.end, models.SalesArchive.last_id
+                ).order_by(models.SalesArchive.period)).all())
+                if loaded and now_archived == archived:
+                    floor = max(max_id - SNAPSHOT_LOOKBACK_IDS, 0)
+                    self._append(self._load(db, now_archived, floor), floor)
+                else:
+                    self._replace(self._load(db, now_archived))
+            with self._lock:
+                self._version = version
+                self._archived = now_archived
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._loaded:
+                self._loading = False
+                self._loaded.notify_all()
+
+    def _load(self, db: Session, archived: tuple, floor: int = None) -> dict:
+        # Sales with ids above `floor`, in id order, less the archived ones;
+        # a full load (no floor) starts with the archived periods' rollups
+        connection = db.connection()
+        # Every column comes back as an integer, in COLUMNS order
+        statement = select(
+            models.Sale.id,
+            models.Sale.product_id,
+            day_number_column(models.Sale.date, connection.dialect.name),
+            models.Sale.quantity,
+            cast(func.round(models.Sale.quantity * models.Sale.unit_price * 100), Integer),
+        ).where(models.Sale.id > (floor or 0), models.Sale.product_id.isnot(None), models.Sale.date.isnot(None)) \
+            .order_by(models.Sale.id)
+
+        chunks = []
+        result = connection.execution_options(yield_per=SNAPSHOT_CHUNK_ROWS).execute(statement)
+        for rows in result.partitions():
+            chunk = _to_columns(rows)
+            # Archived rows may still be waiting to be deleted
+            chunks.append(_select(chunk, chunk["id"] > archived_last_ids(chunk, archived)))
+        if floor is None and archived:
+            chunks.insert(0, self._load_archived(connection, archived, chunks))
+        return {
+            name: np.concatenate([chunk[name] for chunk in chunks]) if chunks else np.empty(0, dtype)
+            for name, dtype in COLUMNS.items()
+        }
+
+    def _load_archived(self, connection, archived: tuple, chunks: list) -> dict:
+        # The archived periods' rollups, less the sales backdated into them
+        # since, which are in `chunks` and already counted in the rollups
+        rollup = models.SalesDailyProduct
+        periods = [
+            and_(rollup.day >= start.date(), rollup.day < end.date()) if start else rollup.day < end.date()
+            for start, end, _ in archived
+        ]
+        rows = connection.execute(select(
+            literal(0, Integer),
+            rollup.product_id,
+            day_number_column(rollup.day, connection.dialect.name),
+            rollup.quantity,
+            cast(func.round(rollup.revenue * 100), Integer),
+        ).where(or_(*periods)).order_by(rollup.day, rollup.product_id)).all()
+        days = _to_columns(rows)
+
+        positions = None
+        for chunk in chunks:
+            backdated = archived_last_ids(chunk, archived) >= 0
+            if not backdated.any():
+                continue
+            if positions is None:
+                positions = {key: i for i, key in enumerate(zip(days["product_id"].tolist(), days["day"].tolist()))}
+            for product_id, day, quantity, revenue in zip(
+                chunk["product_id"][backdated].tolist(), chunk["day"][backdated].tolist(),
+                chunk["quantity"][backdated].tolist(), chunk["revenue"][backdated].tolist()
+            ):
+                i = positions.get((product_id, day))
+                if i is not None:
+                    days["quantity"][i] -= quantity
+                    days["revenue"][i] -= revenue
+        return days
+
+    def _replace(self, loaded: dict):
+        with self._lock:
+            self._arrays = loaded
+            self._size = len(loaded["id"])
+            self._max_id = int(loaded["id"].max()) if self._size else 0
+
+    def _append(self, chunk: dict, floor: int):
+        with self._lock:
+            # Skip the re-read ids already held
+            size = self._size
+            held = self._arrays["id"][:size]
+            held = held[held > floor]
+            if len(held):
+                chunk = {name: array[~np.isin(chunk["id"], held)] for name, array in chunk.items()}
+            added = len(chunk["id"])
+            if not added:
+                return
+            if size + added > len(self._arrays["id"]):
+                capacity = max(size + added, 2 * len(self._arrays["id"]), SNAPSHOT_CHUNK_ROWS)
+                grown = {}
+                for name, array in self._arrays.items():
+                    grown[name] = np.empty(capacity, COLUMNS[name])
+                    grown[name][:size] = array[:size]
+                self._arrays = grown
+            for name, array in chunk.items():
+                self._arrays[name][size:size + added] = array
+            self._size = size + added
+            self._max_id = max(self._max_id, int(chunk["id"].max()))
+
+    def columns(self) -> dict:
+        with self._lock:
+            return {name: array[:self._size] for name, array in self._arrays.items()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": self._size,
+                "bytes": sum(array.nbytes for array in self._arrays.values()),
+                "max_id": self._max_id,
+            }
+
+
+sales_snapshot = SalesSnapshot()
+
+
+# ---------- Vectorized analytics ----------
+# Each takes the snapshot's columns and works on whole arrays: a boolean mask
+# for the filters, np.bincount to group by product or day, cumulative sums
+# for windows and shares. Money is summed in integer cents.
+
+# Columns the analytics read once the filters are applied
+MEASURES = ("product_id", "day", "quantity", "revenue")
+
+
+def select_sales(columns: dict, start_date: date = None, end_date: date = None,
+                 product_id: int = None, product_ids=None) -> dict:
+    # `product_ids` restricts to a set of products, e.g. a category's
+    conditions = []
+    if start_date:
+        conditions.append(columns["day"] >= day_number(start_date))
+    if end_date:
+        conditions.append(columns["day"] <= day_number(end_date))
+    if product_id is not None:
+        conditions.append(columns["product_id"] == product_id)
+    if product_ids is not None:
+        conditions.append(np.isin(columns["product_id"], product_ids))
+    if not conditions:
+        return {name: columns[name] for name in MEASURES}
+    mask = np.logical_and.reduce(conditions)
+    return {name: columns[name][mask] for name in MEASURES}
+
+
+def totals_by_product(sales: dict) -> tuple:
+    # (product ids, quantities, revenue in cents) for every product sold
+    length = int(sales["product_id"].max()) + 1 if len(sales["product_id"]) else 0
+    quantities = np.bincount(sales["product_id"], weights=sales["quantity"], minlength=length)
+    revenue = np.bincount(sales["product_id"], weights=sales["revenue"], minlength=length)
+    product_ids = np.flatnonzero(quantities)
+    return product_ids, quantities[product_ids].astype(np.int64), revenue[product_ids].astype(np.int64)
+
+
+def top_products(sales: dict, metric: str, limit: int) -> list:
+    product_ids, quantities, revenue = totals_by_product(sales)
+    values = revenue if metric == "revenue" else quantities
+    # Sort only the products tied with or above the limit-th value
+    if len(values) > limit:
+        candidates = np.flatnonzero(values >= -np.partition(-values, limit - 1)[limit - 1])
+    else:
+        candidates = np.arange(len(values))
+    order = candidates[np.lexsort((product_ids[candidates], -values[candidates]))][:limit]
+    return [(int(product_ids[i]), int(quantities[i]), int(revenue[i])) for i in order]
+
+
+def daily_revenue(sales: dict, first_day: date, last_day: date) -> np.ndarray:
+    # Revenue in cents for every day from first_day to last_day, zeros included
+    offsets = sales["day"].astype(np.int64) - day_number(first_day)
+    return np.bincount(offsets, weights=sales["revenue"], minlength=(last_day - first_day).days + 1)
+
+
+def moving_averages(daily: np.ndarray, windows: list, lead_days: int) -> dict:
+    # Trailing means over each window, for the days after the first
+    # `lead_days`, which only supply history for the first windows
+    cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+    days = np.arange(lead_days, len(daily))
+    return {window: (cumulative[days + 1] - cumulative[days + 1 - window]) / window for window in windows}
+
+
+def abc_classes(sales: dict, a_share: float, b_share: float) -> tuple:
+    # Products by revenue, descending, with cumulative revenue share and
+    # class: A up to a_share of revenue, B up to b_share, C the rest. A
+    # product is classed by the share of revenue before it, so the product
+    # that crosses a boundary belongs to the higher class.
+    product_ids, _, revenue = totals_by_product(sales)
+    order = np.lexsort((product_ids, -revenue))
+    product_ids, revenue = product_ids[order], revenue[order]
+    total = revenue.sum()
+    cumulative = np.cumsum(revenue) / total if total else np.zeros(len(revenue))
+    before = cumulative - (revenue / total if total else 0)
+    classes = np.where(before < a_share, "A", np.where(before < b_share, "B", "C"))
+    return product_ids, revenue, cumulative, classes
+
+
+def sell_through(sales: dict, on_hand: dict, descending: bool = True) -> tuple:
+    # Units sold / (units sold + units on hand) per tracked product, ordered
+    # by rate, where negative stock (OVERSELL_POLICY=allow) counts as none on hand
+    tracked = np.fromiter(on_hand.keys(), np.int64, len(on_hand))
+    stock = np.maximum(np.fromiter(on_hand.values(), np.int64, len(on_hand)), 0)
+    length = max(int(tracked.max()) + 1 if len(tracked) else 0,
+                 int(sales["product_id"].max()) + 1 if len(sales["product_id"]) else 0)
+    sold = np.bincount(sales["product_id"], weights=sales["quantity"], minlength=length)[tracked].astype(np.int64)
+    available = sold + stock
+    rates = np.divide(sold, available, out=np.zeros(len(tracked)), where=available > 0)
+    order = np.lexsort((tracked, -rates if descending else rates))
+    return tracked[order], sold[order], stock[order], rates[order]
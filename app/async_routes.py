@@ -0,0 +1,86 @@
+import inspect
+
+from fastapi import APIRouter, Depends, Response
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db, get_async_read_db, get_db, get_read_db
+
+# Sync session dependencies and their async replacements
+ASYNC_DEPENDENCIES = {
+    get_db: get_async_db,
+    get_read_db: get_async_read_db,
+}
+
+
+# ---------- Async handlers (DB_MODE=async) ----------
+# Each handler is written once against a sync Session. In async mode it is
+# re-registered as an `async def` that takes an AsyncSession and runs the
+# handler through AsyncSession.run_sync, so database I/O goes through the
+# async driver on the event loop instead of occupying a threadpool thread.
+
+def _session_parameter(endpoint):
+    for name, parameter in inspect.signature(endpoint).parameters.items():
+        dependency = getattr(parameter.default, "dependency", None)
+        if dependency in ASYNC_DEPENDENCIES:
+            return name, parameter
+    return None, None
+
+
+def async_endpoint(endpoint, response_model=None):
+    name, parameter = _session_parameter(endpoint)
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    async def run(**kwargs):
+        db = kwargs.pop(name)
+
+        def call(sync_db):
+            result = endpoint(**kwargs, **{name: sync_db})
+            # Validate into the response model while the session can still
+            # load attributes; after run_sync returns, lazy loads would fail
+            if adapter is not None and not isinstance(result, Response):
+                result = adapter.validate_python(result, from_attributes=True)
+            return result
+
+        return await db.run_sync(call)
+
+    signature = inspect.signature(endpoint)
+    run.__signature__ = signature.replace(parameters=[
+        parameter.replace(
+            annotation=AsyncSession,
+            default=Depends(ASYNC_DEPENDENCIES[parameter.default.dependency])
+        ) if parameter_name == name else parameter
+        for parameter_name, parameter in signature.parameters.items()
+    ])
+    run.__name__ = endpoint.__name__
+    run.__doc__ = endpoint.__doc__
+    return run
+
+
+def async_router(router: APIRouter) -> APIRouter:
+    # Copy of `router` with every sync, session-using handler made async;
+    # handlers that are already async manage their own sessions
+    converted = APIRouter()
+    for route in router.routes:
+        endpoint = route.endpoint
+        if isinstance(route, APIRoute) and not inspect.iscoroutinefunction(endpoint) \
+                and _session_parameter(endpoint)[0] is not None:
+            endpoint = async_endpoint(endpoint, route.response_model)
+
+        converted.add_api_route(
+            route.path,
+            endpoint,
+            methods=route.methods,
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            responses=route.responses,
+            name=route.name,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+        )
+    return converted
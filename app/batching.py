@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+
+
+# ---------- Group commit ----------
+
+class GroupCommitQueue:
+    # Collects items submitted by concurrent requests and hands them to
+    # `process(items)` in batches: a batch is flushed once it has `max_items`
+    # or `max_wait` seconds after its first item arrived. `process` runs on
+    # the threadpool, writes the whole batch in one transaction, and returns
+    # one result per item, either a value or the exception to raise for that
+    # item. One batch is written at a time; items arriving meanwhile form the
+    # next one, so batches grow with load.
+
+    def __init__(self, process, max_items: int, max_wait: float):
+        self.process = process
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    async def submit(self, item):
+        # Started on first use, on the event loop serving requests
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+            self._loop = loop
+        future = loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_items:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                results = await run_in_threadpool(self.process, [item for item, _ in batch])
+            except Exception as exc:
+                results = [exc] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():  # the request went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+
+# ---------- Table versions ----------
+# Write handlers bump the version of every table they change after commit;
+# a cached response is only served while the versions of the tables it was
+# built from are unchanged.
+
+class TableVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def bump(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._versions)
+
+
+table_versions = TableVersions()
+
+
+# ---------- Response cache ----------
+
+class CachedResponse:
+    def __init__(self, body: bytes, status_code: int, media_type: str, etag: str, versions: dict, route=None):
+        self.body = body
+        self.status_code = status_code
+        self.media_type = media_type
+        self.etag = etag
+        self.versions = versions
+        self.route = route
+        self.expires_at = time.monotonic() + settings.RESPONSE_CACHE_TTL_SECONDS
+
+
+class ResponseCache:
+    # LRU over at most RESPONSE_CACHE_MAX_BYTES of response bodies, with a
+    # TTL bounding staleness across workers (versions are per process)
+
+    def __init__(self, max_bytes: int):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def get(self, key: str, versions: dict):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry.expires_at < time.monotonic()
+                or any(versions.get(table, 0) != version for table, version in entry.versions.items())
+            ):
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        if len(entry.body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        self._size -= len(self._entries.pop(key).body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "not_modified": self.not_modified,
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES)
+
+
+# ---------- Route declaration ----------
+# GET routes opt in with `dependencies=[Depends(cached("products", ...))]`,
+# naming the tables their response is built from.
+
+def cached(*tables: str):
+    async def mark_cacheable(request: Request):
+        request.state.cache_tables = tables
+    return mark_cacheable
+
+
+def _cache_key(request: Request) -> str:
+    return request.url.path + "?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(","))
+
+
+async def response_cache_middleware(request: Request, call_next):
+    if request.method != "GET":
+        return await call_next(request)
+
+    key = _cache_key(request)
+    versions = table_versions.snapshot()
+    entry = response_cache.get(key, versions)
+
+    if entry is None:
+        response = await call_next(request)
+        tables = getattr(request.state, "cache_tables", None)
+        if tables is None or response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # Versions are from before the handler ran, so a write that commits
+        # while it runs invalidates the entry instead of being masked by it
+        entry = CachedResponse(
+            body, response.status_code, response.media_type or response.headers.get("content-type"), etag,
+            {table: versions.get(table, 0) for table in tables}, request.scope.get("route")
+        )
+        response_cache.put(key, entry)
+    else:
+        # Hits never reach the router; attribute them to the route for metrics
+        request.scope["route"] = entry.route
+
+    if _not_modified(request, entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers={"ETag": entry.etag})
+    return Response(
+        content=entry.body, status_code=entry.status_code, media_type=entry.media_type,
+        headers={"ETag": entry.etag}
+    )
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import models
+
+
+# ---------- Catalog cache ----------
+
+class CatalogProduct:
+    __slots__ = ("id", "sku", "price", "category_id", "expires_at")
+
+    def __init__(self, id: int, sku: str, price, category_id: int):
+        self.id = id
+        self.sku = sku
+        self.price = price
+        self.category_id = category_id
+        self.expires_at = time.monotonic() + settings.CATALOG_CACHE_TTL_SECONDS
+
+
+class CatalogCategory:
+    __slots__ = ("id", "name", "expires_at")
+
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.expires_at = time.monotonic() + settings.CATALOG_CACHE_TTL_SECONDS
+
+
+class CatalogCache:
+    # Read-through cache of what the write paths look up by id or SKU: each
+    # product's price and category, and each category's name. It holds at
+    # most CATALOG_CACHE_MAX_ENTRIES products and as many categories, least
+    # recently used out first. Misses are not cached, so a product created by
+    # another worker is found on first use. Writes in this process invalidate
+    # the products they change after commit; entries expire after
+    # CATALOG_CACHE_TTL_SECONDS to pick up other workers' changes.
+    #
+    # Every invalidation starts a new generation, and rows read before it are
+    # not stored, so a read that races an update cannot cache the old price.
+
+    def __init__(self, max_entries: int):
+        self._lock = threading.Lock()
+        self._products = OrderedDict()
+        self._skus = {}
+        self._categories = OrderedDict()
+        self.generation = 0
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _fresh(self, entries: OrderedDict, key):
+        # Under the lock: the entry if cached and not expired
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(entries, key)
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    def _remove(self, entries: OrderedDict, key):
+        entry = entries.pop(key, None)
+        if entry is not None and entries is self._products:
+            self._skus.pop(entry.sku, None)
+
+    def _store(self, entries: OrderedDict, loaded: list, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            for entry in loaded:
+                self._remove(entries, entry.id)
+                entries[entry.id] = entry
+                if entries is self._products and entry.sku is not None:
+                    self._skus[entry.sku] = entry.id
+            while len(entries) > self.max_entries:
+                self._remove(entries, next(iter(entries)))
+                self.evictions += 1
+
+    # ---------- Products ----------
+
+    def cached_products(self, product_ids: set) -> dict:
+        # The cached subset of `product_ids`, without touching the database
+        with self._lock:
+            found = {}
+            for product_id in product_ids:
+                entry = self._fresh(self._products, product_id)
+                if entry is not None:
+                    found[product_id] = entry
+            self.hits += len(found)
+            self.misses += len(product_ids) - len(found)
+            return found
+
+    def add_products(self, rows, generation: int) -> list:
+        # Rows with id, sku, price and category_id, read by the caller while
+        # `generation` was current
+        loaded = [CatalogProduct(row.id, row.sku, row.price, row.category_id) for row in rows]
+        self._store(self._products, loaded, generation)
+        return loaded
+
+    def products(self, db: Session, product_ids) -> dict:
+        # {product_id: CatalogProduct} for the ids that exist, reading the
+        # uncached ones in one query
+        product_ids = set(product_ids)
+        found = self.cached_products(product_ids)
+        missing = product_ids - found.keys()
+        if missing:
+            generation = self.generation
+            rows = db.query(models.Product.id, models.Product.sku, models.Product.price, models.Product.category_id) \
+                .filter(models.Product.id.in_(missing)).all()
+            found.update((product.id, product) for product in self.add_products(rows, generation))
+        return found
+
+    def products_by_sku(self, db: Session, skus) -> dict:
+        # {sku: CatalogProduct} for the SKUs that exist
+        skus = set(skus)
+        with self._lock:
+            found = {}
+            for sku in skus:
+                entry = self._fresh(self._products, self._skus.get(sku))
+                if entry is not None:
+                    found[sku] = entry
+            missing = skus - found.keys()
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            generation = self.generation
+            rows = db.query(models.Product.id, models.Product.sku, models.Product.price, models.Product.category_id) \
+                .filter(models.Product.sku.in_(missing)).all()
+            found.update((product.sku, product) for product in self.add_products(rows, generation))
+        return found
+
+    def invalidate_products(self, product_ids=(), skus=()):
+        # Called after commit by every write that changes existing products
+        with self._lock:
+            self.generation += 1
+            for product_id in product_ids:
+                self._remove(self._products, product_id)
+            for sku in skus:
+                self._remove(self._products, self._skus.get(sku))
+
+    # ---------- Categories ----------
+
+    def category_names(self, db: Session, category_ids) -> dict:
+        # {category_id: name} for the ids that exist
+        category_ids = set(category_ids)
+        with self._lock:
+            found = {}
+            for category_id in category_ids:
+                entry = self._fresh(self._categories, category_id)
+                if entry is not None:
+                    found[category_id] = entry.name
+            missing = category_ids - found.keys()
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            generation = self.generation
+            rows = db.query(models.Category.id, models.Category.name).filter(models.Category.id.in_(missing)).all()
+            self._store(self._categories, [CatalogCategory(category_id, name) for category_id, name in rows], generation)
+            found.update(rows)
+        return found
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._products.clear()
+            self._skus.clear()
+            self._categories.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "products": len(self._products),
+                "categories": len(self._categories),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+catalog = CatalogCache(settings.CATALOG_CACHE_MAX_ENTRIES)
@@ -10,5 +10,79 @@ class Settings:
     DB_USER = os.getenv("DB_USER")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
     DB_NAME = os.getenv("DB_NAME")
+    # Full SQLAlchemy URL; overrides the DB_* settings (e.g. sqlite:///./local.db)
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    # "sync": handlers run on the threadpool with Session
+    # "async": handlers run on the event loop with AsyncSession (aiomysql / aiosqlite)
+    DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+    # Connection pool, per engine and per worker process
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Recycle connections before MySQL's wait_timeout closes them server-side
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Connections each worker opens at startup, before serving requests
+    DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", os.getenv("DB_POOL_SIZE", "5")))
+    # Also load the stock level and search indexes and the sales snapshot at
+    # startup, instead of on first use
+    STARTUP_WARM_INDEXES = os.getenv("STARTUP_WARM_INDEXES", "false").lower() == "true"
+
+    # Read replicas for GET endpoints: comma-separated SQLAlchemy URLs.
+    # A replica that fails to connect is skipped for DB_REPLICA_RETRY_SECONDS.
+    DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+    # Sales and orders for more than the stock on hand: "reject" (409) or
+    # "allow" (stock goes negative)
+    OVERSELL_POLICY = os.getenv("OVERSELL_POLICY", "reject").lower()
+
+    # Queue POST /sales/ and commit the sales that arrive within
+    # SALES_GROUP_COMMIT_MAX_WAIT_MS (up to SALES_GROUP_COMMIT_MAX_ITEMS) together
+    SALES_GROUP_COMMIT = os.getenv("SALES_GROUP_COMMIT", "false").lower() == "true"
+    SALES_GROUP_COMMIT_MAX_ITEMS = int(os.getenv("SALES_GROUP_COMMIT_MAX_ITEMS", "200"))
+    SALES_GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv("SALES_GROUP_COMMIT_MAX_WAIT_MS", "5"))
+
+    # Monthly sales partitions (MySQL) and archiving of closed months (app/partitions.py):
+    # partitions kept ready after the current month, how many months stay in
+    # `sales` by default when archiving, and where archive files go
+    SALES_PARTITIONS_AHEAD = int(os.getenv("SALES_PARTITIONS_AHEAD", "3"))
+    SALES_ARCHIVE_AFTER_MONTHS = int(os.getenv("SALES_ARCHIVE_AFTER_MONTHS", "24"))
+    SALES_ARCHIVE_DIR = os.getenv("SALES_ARCHIVE_DIR", "./archive")
+
+    # Per-request SQL statement budget checks: "off", "warn" or "enforce"
+    SQL_QUERY_BUDGET_MODE = os.getenv("SQL_QUERY_BUDGET_MODE", "off").lower()
+
+    # Request and query metrics at GET /metrics (Prometheus text format)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Add a Server-Timing header (SQL, pool wait, serialization, total) to every response
+    SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() == "true"
+    # Log and aggregate statements at least this slow (GET /admin/slow-queries); 0 disables
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+    # In-process n-gram search index for name filters (app/search.py)
+    SEARCH_INDEX_TTL_SECONDS = float(os.getenv("SEARCH_INDEX_TTL_SECONDS", "60"))
+    SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "10000"))
+
+    # In-process stock level index behind /inventory/low-stock (app/stock_index.py)
+    LOW_STOCK_INDEX_TTL_SECONDS = float(os.getenv("LOW_STOCK_INDEX_TTL_SECONDS", "30"))
+
+    # In-process product/category cache for the write paths' price and
+    # existence lookups (app/catalog.py)
+    CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "100000"))
+    CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+
+    # In-process columnar sales snapshot behind /sales/analytics/* (app/analytics.py)
+    ANALYTICS_SNAPSHOT_TTL_SECONDS = float(os.getenv("ANALYTICS_SNAPSHOT_TTL_SECONDS", "30"))
+
+    # Write-invalidated GET response cache (app/cache.py)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+    # Gzip responses of at least this many bytes for clients that accept it; 0 disables
+    RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "0"))
 
 settings = Settings()
\ No newline at end of file
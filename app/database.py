@@ -1,22 +1,194 @@
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+from sqlalchemy import create_engine, event, exc, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.instrumentation import TimedCheckoutMixin, instrument_engine, instrument_pool
 
 # MySQL connection string using PyMySQL driver
-DATABASE_URL = (
+DATABASE_URL = settings.DATABASE_URL or (
     f"mysql+pymysql://{settings.DB_USER}:{settings.DB_PASSWORD}"
     f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 )
 
+# Async drivers used for the same database when DB_MODE=async
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+# Queue pools that record how long each checkout waited for a connection
+class TimedQueuePool(TimedCheckoutMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+def engine_options(url, async_mode=False):
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    url = make_url(url)
+    # In-memory SQLite needs its single shared connection, so keep the default pool
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=TimedAsyncQueuePool if async_mode else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine)
+instrument_pool(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine, only created when DB_MODE=async
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_MODE == "async":
+    async_engine = create_async_engine(
+        async_database_url(DATABASE_URL), **engine_options(DATABASE_URL, async_mode=True)
+    )
+    instrument_engine(async_engine.sync_engine)
+    instrument_pool(async_engine.sync_engine, "primary_async")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+# Read replicas. Read-only endpoints take their session from get_read_db,
+# which picks replicas round-robin. A replica whose connections fail is
+# taken out of rotation for DB_REPLICA_RETRY_SECONDS and then tried again;
+# with no healthy replica, reads go to the primary.
+class ReplicaSet:
+    def __init__(self, primary):
+        self.primary = primary
+        self.engines = []
+        self._down_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, engine, sync_engine):
+        self.engines.append(engine)
+
+        def on_error(context):
+            # Disconnects, and failures to open a connection at all
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(engine)
+        event.listen(sync_engine, "handle_error", on_error)
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down_until[engine] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+
+    def candidates(self) -> list:
+        # Healthy replicas starting from the next in rotation, then the primary
+        now = time.monotonic()
+        start = next(self._counter)
+        rotation = self.engines[start % len(self.engines):] + self.engines[:start % len(self.engines)] \
+            if self.engines else []
+        return [engine for engine in rotation if self._down_until.get(engine, 0) <= now] + [self.primary]
+
+    def connect(self):
+        # Check out a connection up front, so a replica that is down is
+        # skipped for this request too rather than failing it
+        *replicas, primary = self.candidates()
+        for engine in replicas:
+            try:
+                return engine.connect()
+            except exc.DBAPIError:
+                self.mark_down(engine)
+        return primary.connect()
+
+    async def connect_async(self):
+        *replicas, primary = self.candidates()
+        for engine in replicas:
+            try:
+                return await engine.connect()
+            except exc.DBAPIError:
+                self.mark_down(engine)
+        return await primary.connect()
+
+    def status(self) -> list:
+        now = time.monotonic()
+        return [
+            {"url": engine.url.render_as_string(hide_password=True), "healthy": self._down_until.get(engine, 0) <= now}
+            for engine in self.engines
+        ]
+
+
+read_replicas = ReplicaSet(engine)
+async_read_replicas = ReplicaSet(async_engine)
+for number, replica_url in enumerate(settings.DB_REPLICA_URLS):
+    replica_engine = create_engine(replica_url, **engine_options(replica_url))
+    instrument_engine(replica_engine)
+    instrument_pool(replica_engine, f"replica_{number}")
+    read_replicas.add(replica_engine, replica_engine)
+
+    if settings.DB_MODE == "async":
+        replica_engine = create_async_engine(
+            async_database_url(replica_url), **engine_options(replica_url, async_mode=True)
+        )
+        instrument_engine(replica_engine.sync_engine)
+        instrument_pool(replica_engine.sync_engine, f"replica_{number}_async")
+        async_read_replicas.add(replica_engine, replica_engine.sync_engine)
+
 # Dependency for FastAPI endpoints
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Session on a read replica (or the primary) for read-only endpoints
+def get_read_db():
+    connection = read_replicas.connect()
+    db = SessionLocal(bind=connection)
+    try:
+        yield db
+    finally:
+        db.close()
+        connection.close()
+
+# Async counterparts of get_db and get_read_db, swapped in by app.async_routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    connection = await async_read_replicas.connect_async()
+    try:
+        async with AsyncSessionLocal(bind=connection) as db:
+            yield db
+    finally:
+        await connection.close()
+
+# Dialect-appropriate INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE.
+# `values(inserted)` builds the SET clause from the row that failed to insert.
+def upsert(db, table, rows, keys, values):
+    if not rows:
+        return None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(values(stmt.inserted))
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=values(stmt.excluded))
+    else:
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
+    return db.execute(stmt, rows)
@@ -0,0 +1,123 @@
+import csv
+import io
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.database import SessionLocal, read_replicas
+from app.serialization import dump_json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+# ---------- Writers ----------
+# Each writer turns an iterator of row chunks into an iterator of byte
+# chunks, so only one chunk of rows is in memory at a time. `columns` is a
+# list of (name, kind) with kind one of int, str, decimal, datetime.
+
+def write_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def write_ndjson(columns, chunks):
+    names = [name for name, _ in columns]
+    for rows in chunks:
+        yield b"".join(dump_json(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file for ParquetWriter whose contents are drained after
+    # every row group
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+def _arrow_type(kind: str):
+    return {
+        "int": pyarrow.int64(),
+        "str": pyarrow.string(),
+        "decimal": pyarrow.decimal128(14, 2),
+        "datetime": pyarrow.timestamp("us"),
+    }[kind]
+
+def write_parquet(columns, chunks):
+    schema = pyarrow.schema([(name, _arrow_type(kind)) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for rows in chunks:
+        # One row group per chunk
+        writer.write_table(pyarrow.Table.from_pylist(
+            [dict(zip(schema.names, row)) for row in rows], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+EXPORT_WRITERS = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "parquet": write_parquet,
+}
+
+
+# ---------- Streaming responses ----------
+
+def export_response(build_statement, columns, export_format: str, filename: str) -> StreamingResponse:
+    # `build_statement(db)` returns the SELECT to export, ordered by id. Rows
+    # are read as plain tuples (no ORM loading) through a server-side cursor
+    # on a read replica, one chunk at a time, by a connection owned by the
+    # response stream.
+    if export_format == "parquet" and pyarrow is None:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+
+    def stream():
+        connection = read_replicas.connect()
+        db = SessionLocal(bind=connection)
+        try:
+            statement = build_statement(db)
+            result = connection.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(statement)
+            yield from EXPORT_WRITERS[export_format](columns, result.partitions())
+        finally:
+            db.close()
+            connection.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -0,0 +1,143 @@
+import types
+import typing
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import Column
+from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy.sql.visitors import iterate
+
+
+# ---------- Sparse fieldsets ----------
+# `fields=quantity,product.name` picks the columns returned at each level and
+# `expand=product,product.category` picks the relations to include (a dotted
+# field implies expanding its relation). Only those columns are selected and
+# only those relations are joined or loaded. Without either parameter list
+# endpoints return the full response model.
+
+def _split(value: str) -> list:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _nested_schema(annotation):
+    # The schema inside Optional[...] / List[...], or None for scalar fields
+    while typing.get_origin(annotation) in (typing.Union, types.UnionType, list, typing.List):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None
+        annotation = args[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+class Fieldset:
+    def __init__(self, model, columns: list, relations: dict, many: bool = False):
+        self.model = model
+        self.columns = columns
+        self.relations = relations
+        self.many = many
+
+    def project(self, obj) -> dict:
+        loaded = obj.__dict__
+        result = {name: loaded[name] if name in loaded else getattr(obj, name) for name in self.columns}
+        for name, child in self.relations.items():
+            value = loaded[name] if name in loaded else getattr(obj, name)
+            if child.many:
+                result[name] = [child.project(item) for item in value]
+            else:
+                result[name] = None if value is None else child.project(value)
+        return result
+
+
+def _build(model, schema, path: tuple, requested: dict, relations: set, many: bool = False) -> Fieldset:
+    scalar, nested = [], {}
+    for name, field in schema.model_fields.items():
+        nested_schema = _nested_schema(field.annotation)
+        if nested_schema is None:
+            scalar.append(name)
+        else:
+            nested[name] = nested_schema
+
+    columns = requested.get(path) or scalar
+    for name in columns:
+        if name not in scalar:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{'.'.join(path + (name,))}'")
+
+    children = {}
+    for relation in sorted(relations):
+        if len(relation) != len(path) + 1 or relation[:-1] != path:
+            continue
+        name = relation[-1]
+        if name not in nested:
+            raise HTTPException(status_code=400, detail=f"Cannot expand '{'.'.join(relation)}'")
+        prop = getattr(model, name).property
+        children[name] = _build(prop.mapper.class_, nested[name], relation, requested, relations, prop.uselist)
+    return Fieldset(model, columns, children, many)
+
+
+def parse_fieldset(model, schema, fields: str = None, expand: str = None):
+    # None when neither parameter is given, i.e. the full response model
+    if not fields and not expand:
+        return None
+
+    requested, relations = {}, set()
+    for path in _split(expand):
+        parts = tuple(path.split("."))
+        relations.update(parts[:i] for i in range(1, len(parts) + 1))
+    for field in _split(fields):
+        *path, name = field.split(".")
+        path = tuple(path)
+        relations.update(path[:i] for i in range(1, len(path) + 1))
+        requested.setdefault(path, []).append(name)
+    return _build(model, schema, (), requested, relations)
+
+
+# ---------- Loader options ----------
+# `strategies` maps each relation path the endpoint can load to its loader
+# (contains_eager where the query already joins it, otherwise joinedload or
+# selectinload). With no fieldset every listed relation is loaded in full.
+
+def load_options(model, fieldset, strategies: dict, path: tuple = ()) -> list:
+    options = []
+    if fieldset is not None:
+        options.append(load_only(*(getattr(model, name) for name in fieldset.columns)))
+        names = list(fieldset.relations)
+    else:
+        names = [key.split(".")[-1] for key in strategies if tuple(key.split("."))[:-1] == path]
+
+    for name in names:
+        attribute = getattr(model, name)
+        child_path = path + (name,)
+        loader = strategies.get(".".join(child_path), selectinload)
+        child = fieldset.relations[name] if fieldset is not None else None
+        options.append(loader(attribute).options(
+            *load_options(attribute.property.mapper.class_, child, strategies, child_path)
+        ))
+    return options
+
+
+# ---------- Joins ----------
+# List endpoints join a related table only when the response or a filter
+# reads it. The search filters read products or categories only when they
+# fall back to ILIKE; otherwise they are id IN (...) on the listed table.
+
+def relation_requested(fieldset, path: str) -> bool:
+    # With no fieldset the full response model, so every relation, is returned
+    for name in path.split("."):
+        if fieldset is None:
+            return True
+        fieldset = fieldset.relations.get(name)
+        if fieldset is None:
+            return False
+    return True
+
+
+def tables_read(clauses) -> set:
+    # Names of the tables whose columns appear in `clauses` (SQL expressions
+    # or ORM attributes)
+    return {
+        element.table.name
+        for clause in clauses for element in iterate(getattr(clause, "__clause_element__", lambda: clause)())
+        if isinstance(element, Column) and element.table is not None
+    }
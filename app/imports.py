@@ -0,0 +1,116 @@
+import codecs
+import csv
+import json
+import tempfile
+import time
+
+from fastapi import Request
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import SessionLocal
+
+IMPORT_MAX_ERRORS = 1000
+
+
+# ---------- Upload ----------
+
+async def spool_body(request: Request):
+    # Request body to a temporary file, on disk past 1 MB
+    upload = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    upload.seek(0)
+    return upload
+
+
+# ---------- Parsing ----------
+# Rows are (line number, dict). CSV needs a header row; empty cells are
+# treated as missing values.
+
+def _csv_rows(upload):
+    reader = csv.DictReader(codecs.getreader("utf-8-sig")(upload))
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+
+def _ndjson_rows(upload):
+    for line_no, line in enumerate(upload, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+IMPORT_READERS = {
+    "csv": _csv_rows,
+    "ndjson": _ndjson_rows,
+}
+
+
+def import_error(line_no: int, error) -> dict:
+    return {"line": line_no, "error": error}
+
+
+# ---------- Import ----------
+
+def run_import(upload, import_format: str, schema, write_chunk, chunk_size: int, after_commit=None) -> dict:
+    # Validates rows against `schema` and hands them to
+    # `write_chunk(db, [(line_no, row), ...])` one chunk per transaction.
+    # `write_chunk` returns the errors for rows it could not write;
+    # `after_commit(db, chunk)` runs once the chunk is committed.
+    started = time.perf_counter()
+    rows = written = 0
+    errors = []
+    db = SessionLocal()
+
+    def flush(chunk):
+        nonlocal written
+        try:
+            chunk_errors = write_chunk(db, chunk)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            chunk_errors = [import_error(line_no, "Database error") for line_no, _ in chunk]
+        else:
+            if after_commit is not None:
+                after_commit(db, chunk)
+        written += len(chunk) - len(chunk_errors)
+        errors.extend(chunk_errors)
+
+    chunk = []
+    try:
+        try:
+            for line_no, data in IMPORT_READERS[import_format](upload):
+                rows += 1
+                if data is None:
+                    errors.append(import_error(line_no, "Invalid JSON"))
+                    continue
+                try:
+                    chunk.append((line_no, schema.model_validate(data)))
+                except ValidationError as exc:
+                    errors.append(import_error(
+                        line_no, exc.errors(include_url=False, include_context=False, include_input=False)
+                    ))
+                    continue
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # Keep what was read so far; the rest of the file is skipped
+            errors.append(import_error(None, f"Unreadable {import_format} file: {exc}"))
+        if chunk:
+            flush(chunk)
+    finally:
+        db.close()
+
+    errors.sort(key=lambda error: error["line"] or 0)
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "written": written,
+        "failed": len(errors),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else rows,
+        "errors": errors[:IMPORT_MAX_ERRORS],
+    }
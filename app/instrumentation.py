@@ -0,0 +1,251 @@
+import bisect
+import itertools
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy import exc as sqlalchemy_exc
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- Per-request SQL statement counting ----------
+# Besides the statement count, each request accumulates the time spent in
+# SQL, waiting for a pool connection and serializing JSON, so the metrics
+# middleware can split a slow request between them.
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.budget = None
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.statements > self.budget
+
+
+_request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+def start_request_stats() -> RequestStats:
+    stats = RequestStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def current_request_stats():
+    return _request_stats.get()
+
+
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    context._started = time.perf_counter()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+
+
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._started
+    query_durations.get(statement.lstrip()[:6].upper(), query_durations["OTHER"]).observe(seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.sql_seconds += seconds
+    if settings.SLOW_QUERY_MS and seconds * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries.record(statement, seconds)
+
+
+@contextmanager
+def statements_not_counted():
+    # For cache and index maintenance that happens to run inside a request
+    token = _request_stats.set(None)
+    try:
+        yield
+    finally:
+        _request_stats.reset(token)
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _start_statement)
+    event.listen(engine, "after_cursor_execute", _end_statement)
+
+
+# ---------- Query budgets ----------
+# Endpoints declare the number of statements their loading plan needs with
+# `dependencies=[Depends(query_budget(n))]`; a regression back to lazy loading
+# shows up as a request that goes over its budget.
+
+def query_budget(max_statements: int):
+    async def set_budget():
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.budget = max_statements
+    return set_budget
+
+
+# ---------- Histograms ----------
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        # Cumulative counts per upper bound, as in Prometheus histograms
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = list(itertools.accumulate(counts))
+        return {
+            "buckets": {**{str(bound): n for bound, n in zip(self.buckets, cumulative)}, "+Inf": cumulative[-1]},
+            "count": cumulative[-1],
+            "sum": total,
+        }
+
+
+# ---------- Query timing ----------
+
+QUERY_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+query_durations = {
+    operation: Histogram(QUERY_DURATION_BUCKETS) for operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "OTHER")
+}
+
+
+# ---------- Slow query log ----------
+# Statements slower than SLOW_QUERY_MS are logged and aggregated by their
+# normalized SQL: literals and placeholders become ?, and IN lists and
+# multi-row VALUES of any length collapse to (?, ...), so one query shape is
+# one entry.
+
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\?")
+_SQL_LISTS = re.compile(r"\(\?(?:, \?)+\)")
+_SQL_ROWS = re.compile(r"(\(\?, \.\.\.\))(?:, \(\?, \.\.\.\))+")
+
+
+def normalize_sql(statement: str) -> str:
+    sql = " ".join(statement.split())
+    sql = _SQL_PLACEHOLDERS.sub("?", _SQL_LITERALS.sub("?", sql))
+    return _SQL_ROWS.sub(r"\1, ...", _SQL_LISTS.sub("(?, ...)", sql))
+
+
+class SlowQueryLog:
+    def __init__(self, max_entries: int = 200):
+        self.max_entries = max_entries
+        self.total = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        sql = normalize_sql(statement)
+        logger.warning("Slow query (%.1f ms): %s", seconds * 1000, sql)
+        with self._lock:
+            self.total += 1
+            entry = self._entries.get(sql)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    # Make room by dropping the shape with the least total time
+                    del self._entries[min(self._entries, key=lambda key: self._entries[key]["total_seconds"])]
+                entry = self._entries[sql] = {"sql": sql, "count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry["total_seconds"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_queries = SlowQueryLog()
+
+
+# ---------- Connection pool metrics ----------
+
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolMetrics:
+    COUNTERS = ("connects", "checkouts", "checkins", "invalidations", "soft_invalidations", "wait_timeouts")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.wait_seconds = Histogram(POOL_WAIT_BUCKETS)
+        self._lock = threading.Lock()
+
+    def increment(self, counter: str):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        pool = self.engine.pool
+        gauges = {}
+        if hasattr(pool, "checkedout"):
+            gauges = {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            }
+        return {"pool": type(pool).__name__, **gauges, **counts, "wait_seconds": self.wait_seconds.snapshot()}
+
+
+pool_metrics = {}
+
+
+class TimedCheckoutMixin:
+    # Times how long a checkout waits for a free connection (QueuePool._do_get
+    # blocks until one is returned, overflow allows a new one, or timeout)
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy_exc.TimeoutError:
+            self.metrics.increment("wait_timeouts")
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.metrics.wait_seconds.observe(waited)
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.pool_wait_seconds += waited
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep recording into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def instrument_pool(engine, name: str):
+    metrics = PoolMetrics(engine)
+    engine.pool.metrics = metrics
+    pool_metrics[name] = metrics
+
+    event.listen(engine, "connect", lambda *args: metrics.increment("connects"))
+    event.listen(engine, "checkout", lambda *args: metrics.increment("checkouts"))
+    event.listen(engine, "checkin", lambda *args: metrics.increment("checkins"))
+    event.listen(engine, "invalidate", lambda *args: metrics.increment("invalidations"))
+    event.listen(engine, "soft_invalidate", lambda *args: metrics.increment("soft_invalidations"))
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exc
+
+from app import migrate
+from app.analytics import sales_snapshot
+from app.config import settings
+from app.database import SessionLocal, async_engine, async_read_replicas, engine, read_replicas
+from app.instrumentation import logger
+from app.search import catalog_search
+from app.stock_index import stock_index
+
+
+# ---------- Worker startup and shutdown ----------
+# create_engine() does not connect, so importing the app never touches the
+# database; each worker connects in its lifespan instead.
+# Startup checks the schema version (migrations are applied separately with
+# `python -m app.migrate upgrade`), opens DB_POOL_WARMUP connections so the
+# first requests don't pay for the connects, probes the replicas and,
+# optionally, loads the in-process indexes. Failures are logged and reported
+# by GET /health/ready rather than stopping the worker.
+
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.seconds = None
+        self.schema_version = None
+        self.problems = []
+
+
+startup = StartupState()
+
+
+def _warm_pool(engine, connections: int):
+    # Hold `connections` connections at once, so that many are opened and
+    # then left idle in the pool
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+async def _warm_async_pool(engine, connections: int):
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(await engine.connect())
+    finally:
+        await asyncio.gather(*(connection.close() for connection in opened))
+
+
+def _warm_up():
+    try:
+        with engine.connect() as connection:
+            startup.schema_version = migrate.current_version(connection)
+        if startup.schema_version < migrate.head_version():
+            startup.problems.append(
+                f"schema version {startup.schema_version}, expected {migrate.head_version()}: run python -m app.migrate upgrade"
+            )
+        _warm_pool(engine, settings.DB_POOL_WARMUP)
+    except exc.DBAPIError as error:
+        startup.problems.append(f"primary database unavailable: {error.orig}")
+        return
+
+    for replica in read_replicas.engines:
+        try:
+            _warm_pool(replica, settings.DB_POOL_WARMUP)
+        except exc.DBAPIError:
+            read_replicas.mark_down(replica)
+            logger.warning("Replica %s unavailable at startup", replica.url.render_as_string(hide_password=True))
+
+    if settings.STARTUP_WARM_INDEXES and not startup.problems:
+        db = SessionLocal()
+        try:
+            stock_index.refresh(db)
+            catalog_search.refresh(db)
+            sales_snapshot.refresh(db)
+        finally:
+            db.close()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    await run_in_threadpool(_warm_up)
+    if async_engine is not None and not startup.problems:
+        for engine_to_warm in (async_engine, *async_read_replicas.engines):
+            try:
+                await _warm_async_pool(engine_to_warm, settings.DB_POOL_WARMUP)
+            except exc.DBAPIError:
+                if engine_to_warm is async_engine:
+                    startup.problems.append("primary database unavailable (async driver)")
+                else:
+                    async_read_replicas.mark_down(engine_to_warm)
+
+    startup.seconds = time.perf_counter() - started
+    startup.ready = True
+    if startup.problems:
+        logger.warning("Worker %d started in %.3f s, not ready: %s", os.getpid(), startup.seconds, "; ".join(startup.problems))
+    else:
+        logger.info("Worker %d ready in %.3f s", os.getpid(), startup.seconds)
+
+    yield
+
+    startup.ready = False
+    for sync_engine in (engine, *read_replicas.engines):
+        sync_engine.dispose()
+    if async_engine is not None:
+        for engine_to_dispose in (async_engine, *async_read_replicas.engines):
+            await engine_to_dispose.dispose()
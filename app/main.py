@@ -1,17 +1,60 @@
-from fastapi import FastAPI
-from app.database import Base, engine
-from app.routers import products, inventory, sales, orders
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from app.async_routes import async_router
+from app.cache import response_cache_middleware
+from app.config import settings
+from app.instrumentation import current_request_stats, logger, start_request_stats
+from app.lifecycle import lifespan
+from app.metrics import RequestMetricsMiddleware
+from app.routers import products, inventory, sales, orders, admin, metrics, health
 
-app = FastAPI()
+# Workers connect and warm their pools in the lifespan; the schema is managed
+# separately with `python -m app.migrate upgrade`
+app = FastAPI(lifespan=lifespan)
 
-# Create all DB tables
-Base.metadata.create_all(bind=engine)
+# Liveness and readiness probes
+app.include_router(health.router)
 
-# Include routers
-app.include_router(products.router)
-app.include_router(inventory.router)
-app.include_router(sales.router)
-app.include_router(orders.router)
+# Include routers; in async mode their handlers run on AsyncSession
+for module in (products, inventory, sales, orders, admin):
+    app.include_router(async_router(module.router) if settings.DB_MODE == "async" else module.router)
+
+# Serve cacheable GET responses from memory, with ETag / 304 support
+if settings.RESPONSE_CACHE_ENABLED:
+    app.middleware("http")(response_cache_middleware)
+
+# Count SQL statements per request and check them against the endpoint's budget
+if settings.SQL_QUERY_BUDGET_MODE in ("warn", "enforce"):
+    @app.middleware("http")
+    async def check_query_budget(request: Request, call_next):
+        # Started by the metrics middleware, unless that is disabled
+        stats = current_request_stats() or start_request_stats()
+        response = await call_next(request)
+
+        if stats.over_budget:
+            logger.warning(
+                "%s %s issued %d SQL statements (budget %d)",
+                request.method, request.url.path, stats.statements, stats.budget
+            )
+            if settings.SQL_QUERY_BUDGET_MODE == "enforce":
+                response = JSONResponse(
+                    status_code=500,
+                    content={"detail": f"SQL statement budget exceeded: {stats.statements} > {stats.budget}"}
+                )
+
+        response.headers["X-SQL-Statements"] = str(stats.statements)
+        return response
+
+# Compress large responses; outermost, so cached bodies stay uncompressed
+if settings.RESPONSE_GZIP_MIN_BYTES > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.RESPONSE_GZIP_MIN_BYTES)
+
+# Latency per route and status, with SQL, pool wait and serialization time,
+# served at GET /metrics; outermost, so it times everything above
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+    app.add_middleware(RequestMetricsMiddleware)
 
 @app.get("/")
 def read_root():
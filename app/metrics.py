@@ -0,0 +1,168 @@
+import threading
+import time
+
+from app.cache import response_cache
+from app.catalog import catalog
+from app.config import settings
+from app.instrumentation import Histogram, pool_metrics, query_durations, slow_queries, start_request_stats
+
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ---------- Request metrics ----------
+# Per (method, route template, status): a latency histogram, plus the SQL
+# statements and the seconds spent in SQL, waiting for pool connections and
+# serializing JSON, summed over the requests.
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration = Histogram(REQUEST_DURATION_BUCKETS)
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats):
+        key = (method, route, str(status))
+        with self._lock:
+            metrics = self._routes.get(key)
+            if metrics is None:
+                metrics = self._routes[key] = RouteMetrics()
+            metrics.statements += stats.statements
+            metrics.sql_seconds += stats.sql_seconds
+            metrics.pool_wait_seconds += stats.pool_wait_seconds
+            metrics.serialize_seconds += stats.serialize_seconds
+        metrics.duration.observe(seconds)
+
+    def items(self) -> list:
+        with self._lock:
+            return sorted(self._routes.items())
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    # Plain ASGI middleware (no per-request task or Request object) around
+    # the whole app. It starts the request's RequestStats, so statement
+    # counts, SQL and pool wait time recorded anywhere below land on it.
+    # Requests are labelled with their route's path template; requests that
+    # match no route share the "unmatched" label.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = start_request_stats()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_HEADER:
+                    total = (time.perf_counter() - started) * 1000
+                    timing = f"sql;dur={stats.sql_seconds * 1000:.1f}, pool;dur={stats.pool_wait_seconds * 1000:.1f}, " \
+                             f"serialize;dur={stats.serialize_seconds * 1000:.1f}, total;dur={total:.1f}"
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_metrics.observe(scope["method"], route, status, time.perf_counter() - started, stats)
+
+
+# ---------- Prometheus text format ----------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class _Writer:
+    # Collects samples by metric family, since each family's samples must be
+    # contiguous in the output
+    def __init__(self):
+        self._families = {}
+
+    def _lines(self, name: str, kind: str, help_text: str) -> list:
+        if name not in self._families:
+            self._families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        return self._families[name]
+
+    def sample(self, name: str, kind: str, help_text: str, value, **labels):
+        self._lines(name, kind, help_text).append(f"{name}{_labels(**labels) if labels else ''} {value}")
+
+    def histogram(self, name: str, help_text: str, snapshot: dict, **labels):
+        lines = self._lines(name, "histogram", help_text)
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+        lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {snapshot['sum']}")
+        lines.append(f"{name}_count{_labels(**labels) if labels else ''} {snapshot['count']}")
+
+    def render(self) -> str:
+        return "\n".join(line for lines in self._families.values() for line in lines) + "\n"
+
+
+def render_metrics() -> str:
+    out = _Writer()
+
+    for (method, route, status), metrics in request_metrics.items():
+        labels = {"method": method, "route": route, "status": status}
+        out.histogram("http_request_duration_seconds", "HTTP request latency", metrics.duration.snapshot(), **labels)
+        out.sample("http_request_sql_statements_total", "counter", "SQL statements issued by requests",
+                   metrics.statements, **labels)
+        out.sample("http_request_sql_seconds_total", "counter", "Seconds requests spent executing SQL",
+                   metrics.sql_seconds, **labels)
+        out.sample("http_request_pool_wait_seconds_total", "counter",
+                   "Seconds requests spent waiting for a pooled connection", metrics.pool_wait_seconds, **labels)
+        out.sample("http_request_serialize_seconds_total", "counter",
+                   "Seconds requests spent serializing JSON on the projection path", metrics.serialize_seconds, **labels)
+
+    for operation, histogram in query_durations.items():
+        out.histogram("db_query_duration_seconds", "SQL statement execution time", histogram.snapshot(),
+                      operation=operation)
+    out.sample("db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_MS", slow_queries.total)
+
+    for name, metrics in pool_metrics.items():
+        snapshot = metrics.snapshot()
+        for gauge in ("pool_size", "checked_out", "checked_in", "overflow"):
+            if gauge in snapshot:
+                out.sample(f"db_pool_{gauge}", "gauge", f"Connection pool {gauge.replace('_', ' ')}",
+                           snapshot[gauge], pool=name)
+        for counter in metrics.COUNTERS:
+            out.sample(f"db_pool_{counter}_total", "counter", f"Connection pool {counter.replace('_', ' ')}",
+                       snapshot[counter], pool=name)
+        out.histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection",
+                      snapshot["wait_seconds"], pool=name)
+
+    cache = response_cache.stats()
+    out.sample("response_cache_entries", "gauge", "Responses held in the response cache", cache["entries"])
+    out.sample("response_cache_bytes", "gauge", "Bytes held in the response cache", cache["bytes"])
+    for counter in ("hits", "misses", "evictions", "not_modified"):
+        out.sample(f"response_cache_{counter}_total", "counter", f"Response cache {counter.replace('_', ' ')}",
+                   cache[counter])
+
+    entries = catalog.stats()
+    for table in ("products", "categories"):
+        out.sample("catalog_cache_entries", "gauge", "Entries held in the catalog cache", entries[table], table=table)
+    for counter in ("hits", "misses", "evictions"):
+        out.sample(f"catalog_cache_{counter}_total", "counter", f"Catalog cache {counter}", entries[counter])
+
+    return out.render()
@@ -0,0 +1,109 @@
+import argparse
+import functools
+import importlib
+import pkgutil
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+
+from app import migrations
+from app.database import engine
+
+# Versioned schema migrations. Each module in app/migrations is named
+# v<version>_<name> and defines DESCRIPTION and upgrade(connection); the
+# versions applied so far are recorded in schema_migrations. Run before
+# starting (or deploying) the API, which never changes the schema itself:
+#
+#   python -m app.migrate upgrade
+#   python -m app.migrate status
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def available() -> tuple:
+    # (version, module) for every migration, oldest first
+    found = []
+    for module_info in pkgutil.iter_modules(migrations.__path__):
+        if module_info.name.startswith("v"):
+            version = int(module_info.name[1:].split("_", 1)[0])
+            found.append((version, importlib.import_module(f"app.migrations.{module_info.name}")))
+    return tuple(sorted(found, key=lambda migration: migration[0]))
+
+
+def head_version() -> int:
+    migrations_found = available()
+    return migrations_found[-1][0] if migrations_found else 0
+
+
+def current_version(connection) -> int:
+    if not inspect(connection).has_table(schema_migrations.name):
+        return 0
+    return connection.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def schema_out_of_date(bind=engine):
+    # For tools that need the migrated schema but must never change it: a
+    # message telling the operator to migrate, or None when it is current
+    with bind.connect() as connection:
+        current = current_version(connection)
+    if current < head_version():
+        return f"schema version {current}, expected {head_version()}: run python -m app.migrate upgrade"
+    return None
+
+
+def upgrade(bind=engine, target: int = None) -> list:
+    # Applies pending migrations up to `target` (default: all), each in its
+    # own transaction, and returns the versions applied. On MySQL a named
+    # lock keeps two deploys from migrating at once.
+    applied = []
+    with bind.connect() as connection:
+        if connection.dialect.name == "mysql":
+            connection.execute(text("SELECT GET_LOCK('schema_migrations', 300)"))
+            connection.commit()
+        try:
+            with connection.begin():
+                schema_migrations.create(connection, checkfirst=True)
+                current = current_version(connection)
+            for version, module in available():
+                if version <= current or (target is not None and version > target):
+                    continue
+                with connection.begin():
+                    module.upgrade(connection)
+                    connection.execute(insert(schema_migrations).values(
+                        version=version, description=module.DESCRIPTION, applied_at=datetime.utcnow()
+                    ))
+                applied.append(version)
+        finally:
+            if connection.dialect.name == "mysql":
+                connection.execute(text("SELECT RELEASE_LOCK('schema_migrations')"))
+                connection.commit()
+    return applied
+
+
+def status(bind=engine) -> list:
+    with bind.connect() as connection:
+        current = current_version(connection)
+    return [
+        {"version": version, "description": module.DESCRIPTION, "applied": version <= current}
+        for version, module in available()
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or list versioned schema migrations")
+    parser.add_argument("command", choices=["upgrade", "status"])
+    parser.add_argument("--to", type=int, help="Stop at this version (upgrade only)")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade(target=args.to)
+        print(f"Applied migrations: {', '.join(map(str, applied))}." if applied else "Schema is up to date.")
+    else:
+        for migration in status():
+            print(f"{migration['version']:>5}  {'applied' if migration['applied'] else 'pending':<8} {migration['description']}")
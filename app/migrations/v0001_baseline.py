@@ -0,0 +1,13 @@
+from app.models import models
+
+DESCRIPTION = "Baseline schema: all tables and indexes"
+
+
+def upgrade(connection):
+    # Creates whatever is missing, so databases created by the old
+    # create_all at startup (possibly before some indexes existed) are
+    # brought up to the baseline. Later schema changes are new migrations.
+    models.Base.metadata.create_all(bind=connection)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
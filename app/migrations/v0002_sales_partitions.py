@@ -0,0 +1,26 @@
+from datetime import date
+
+from sqlalchemy import func, inspect, select, text
+
+from app.config import settings
+from app.models import models
+from app.partitions import add_months, month_start, partition_sales
+
+DESCRIPTION = "Sales archives table; monthly RANGE partitions on sales (MySQL)"
+
+
+def upgrade(connection):
+    models.SalesArchive.__table__.create(connection, checkfirst=True)
+    if connection.dialect.name != "mysql":
+        # SQLite has no partitioning; archiving works on the plain table
+        return
+
+    # MySQL partitioning requires the partitioning column in every unique key,
+    # including the primary key, and does not support foreign keys. This
+    # rebuilds the table, so on a large `sales` table run it in a maintenance
+    # window.
+    for foreign_key in inspect(connection).get_foreign_keys("sales"):
+        connection.execute(text(f"ALTER TABLE sales DROP FOREIGN KEY {foreign_key['name']}"))
+    connection.execute(text("ALTER TABLE sales MODIFY date DATETIME NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (id, date)"))
+    first = connection.execute(select(func.min(models.Sale.date))).scalar() or date.today()
+    partition_sales(connection, month_start(first), add_months(month_start(date.today()), settings.SALES_PARTITIONS_AHEAD))
@@ -0,0 +1,14 @@
+from sqlalchemy import inspect
+
+from app.models import models
+
+DESCRIPTION = "Index sales.order_id, used to load the lines of a page of orders"
+
+
+def upgrade(connection):
+    # MySQL may already have one: the implicit index of the foreign key that
+    # migration 2 dropped stays behind
+    if any(index["column_names"][:1] == ["order_id"] for index in inspect(connection).get_indexes("sales")):
+        return
+    index = next(index for index in models.Sale.__table__.indexes if index.name == "ix_sales_order_id")
+    index.create(connection)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DECIMAL, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DECIMAL, Date, DateTime, Index, Text
 from sqlalchemy.orm import relationship
 from app.database import Base
 import datetime
@@ -13,14 +13,17 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_category_id_price", "category_id", "price"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False, index=True)
     category_id = Column(Integer, ForeignKey("categories.id"))
     price = Column(DECIMAL(10, 2), nullable=False)
     description = Column(Text)
     sku = Column(String(100), unique=True)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), index=True)
     updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
 
     category = relationship("Category", back_populates="products")
@@ -32,8 +35,8 @@ class Inventory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), unique=True)
-    quantity = Column(Integer, nullable=False)
-    last_updated = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc))
+    quantity = Column(Integer, nullable=False, index=True)
+    last_updated = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), onupdate=datetime.datetime.now(datetime.timezone.utc), index=True)
 
     product = relationship("Product", back_populates="inventory")
 
@@ -44,19 +47,61 @@ class Order(Base):
     customer_name = Column(String(255))
     customer_email = Column(String(255))
     total_amount = Column(DECIMAL(10, 2))
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), index=True)
 
     sales = relationship("Sale", back_populates="order")
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_product_id_date", "product_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, nullable=False)
     unit_price = Column(DECIMAL(10, 2), nullable=False)
-    date = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    date = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc), index=True)
 
     product = relationship("Product", back_populates="sales")
-    order = relationship("Order", back_populates="sales")
\ No newline at end of file
+    order = relationship("Order", back_populates="sales")
+
+# ---------- Revenue rollups ----------
+# Daily sales totals maintained in the same transaction as the sales they
+# summarize (see app/rollups.py); the analytics endpoints read these instead
+# of scanning `sales`.
+
+class SalesDailyProduct(Base):
+    __tablename__ = "sales_daily_product"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(DECIMAL(14, 2), nullable=False, default=0)
+
+class SalesDailyCategory(Base):
+    __tablename__ = "sales_daily_category"
+
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(DECIMAL(14, 2), nullable=False, default=0)
+
+# ---------- Sales archives ----------
+# One row per closed period of sales moved out of `sales` into a file by
+# `python -m app.partitions archive`. Its daily rollups stay, so revenue
+# analytics still cover the period.
+
+class SalesArchive(Base):
+    __tablename__ = "sales_archives"
+
+    period = Column(String(20), primary_key=True)
+    start = Column(DateTime)
+    end = Column(DateTime, nullable=False)
+    path = Column(String(500), nullable=False)
+    rows = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    revenue = Column(DECIMAL(14, 2), nullable=False)
+    archived_at = Column(DateTime, nullable=False)
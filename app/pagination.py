@@ -0,0 +1,112 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# ---------- Cursor encoding ----------
+# A cursor is the (sort key, sort value, id) of the last row of a page, so the
+# next page is an index range scan from that point instead of an OFFSET scan.
+
+def encode_cursor(sort_key: str, value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([sort_key, value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str, sort_column):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if key != sort_key:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+
+    try:
+        if value is not None:
+            python_type = sort_column.type.python_type
+            value = datetime.fromisoformat(value) if python_type is datetime else python_type(value)
+        row_id = int(row_id)
+    except (ValueError, TypeError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, row_id
+
+
+# ---------- Keyset pagination ----------
+
+def _after_cursor(sort_column, id_column, descending: bool, value, last_id):
+    # Rows after (value, last_id). MySQL and SQLite sort NULLs first, so they
+    # come first ascending and last descending; a NULL sort value matches
+    # nothing with < or =, so those rows need IS NULL branches of their own.
+    nullable = getattr(sort_column.expression, "nullable", True)
+    if value is None:
+        if descending:
+            return [sort_column.is_(None), id_column < last_id]
+        return [or_(sort_column.isnot(None), and_(sort_column.is_(None), id_column > last_id))]
+
+    # The plain range on sort_column, implied by the OR, lets the database
+    # use it directly for index ranges and partition pruning
+    if descending:
+        after = and_(sort_column <= value, or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < last_id)
+        ))
+        return [or_(after, sort_column.is_(None))] if nullable else [after]
+    return [sort_column >= value, or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > last_id)
+    )]
+
+
+def paginate(query, sort_key: str, sort_column, id_column, descending: bool, limit: int, cursor: str = None):
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_key, sort_column)
+        query = query.filter(*_after_cursor(sort_column, id_column, descending, value, last_id))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Select the sort value alongside each row so the cursor can be built even
+    # when the sort column lives on a joined table; fetch one extra row to know
+    # whether another page exists.
+    rows = query.add_columns(sort_column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_item, last_value = rows[-1]
+        next_cursor = encode_cursor(sort_key, last_value, last_item.id)
+
+    return {"items": [row[0] for row in rows], "next_cursor": next_cursor}
+
+
+# ---------- Pagination over an in-memory ordering ----------
+# For orderings computed outside the database (e.g. search relevance): the
+# cursor is the position in `ids`, and only the page's rows are loaded.
+
+def paginate_ids(query, ids: list, sort_key: str, id_column, limit: int, cursor: str = None):
+    start = 0
+    if cursor:
+        start, _ = decode_cursor(cursor, sort_key, id_column)
+
+    page_ids = ids[start:start + limit]
+    rows = {row.id: row for row in query.filter(id_column.in_(page_ids))} if page_ids else {}
+
+    next_cursor = None
+    if start + limit < len(ids):
+        next_cursor = encode_cursor(sort_key, start + limit, page_ids[-1])
+
+    return {"items": [rows[row_id] for row_id in page_ids if row_id in rows], "next_cursor": next_cursor}
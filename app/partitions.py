@@ -0,0 +1,314 @@
+import argparse
+import gzip
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, func, inspect, select, text
+
+from app import migrate
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.export import EXPORT_CHUNK_ROWS, pyarrow, write_csv, write_parquet
+from app.instrumentation import logger
+from app.models import models
+from app.rollups import rebuild
+
+# Time-partitioned sales storage. On MySQL, `sales` is RANGE partitioned by
+# month on `date` (migration v0002), with a catch-all p_future partition so
+# inserts never fail for lack of a partition. Run regularly (e.g. daily from
+# cron) and when deploying:
+#
+#   python -m app.partitions ensure                  # create upcoming monthly partitions
+#   python -m app.partitions archive --before 2024-01 # move older months to files
+#   python -m app.partitions status
+#   python -m app.partitions check                   # show the partitions date filters touch
+#
+# SQLite has no partitioning: `sales` stays one table, ensure is a no-op, and
+# archive deletes the archived rows instead of dropping partitions.
+
+FUTURE_PARTITION = "p_future"
+DELETE_CHUNK_ROWS = 10000
+
+ARCHIVE_COLUMNS = [
+    ("id", "int"), ("date", "datetime"), ("order_id", "int"), ("product_id", "int"),
+    ("quantity", "int"), ("unit_price", "decimal"),
+]
+
+
+def month_start(day) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+# ---------- Pruning-friendly filters ----------
+# Date filters on sales must compare the bare `date` column with constants,
+# as these do, so MySQL reads only the partitions in range. Wrapping the
+# column in a function (DATE(), YEAR(), EXTRACT) makes it read every one.
+
+def sales_between(start=None, end=None, end_exclusive: bool = False) -> list:
+    conditions = []
+    if start is not None:
+        conditions.append(models.Sale.date >= start)
+    if end is not None:
+        conditions.append(models.Sale.date < end if end_exclusive else models.Sale.date <= end)
+    return conditions
+
+
+# ---------- MySQL partitions ----------
+
+def _partition_clauses(months) -> str:
+    clauses = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')"
+        for month in months
+    ]
+    return ", ".join(clauses + [f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)"])
+
+
+def _months(first: date, last: date) -> list:
+    months, month = [], first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_sales(connection, first_month: date, last_month: date):
+    connection.execute(text(
+        f"ALTER TABLE sales PARTITION BY RANGE COLUMNS(date) ({_partition_clauses(_months(first_month, last_month))})"
+    ))
+
+
+def partitions(connection) -> list:
+    # (name, exclusive upper bound or None for MAXVALUE, estimated rows), in
+    # order; empty when `sales` is not partitioned
+    if connection.dialect.name != "mysql":
+        return []
+    rows = connection.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sales' AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ))
+    return [
+        (name, None if bound == "MAXVALUE" else datetime.fromisoformat(bound.strip("'")), estimated_rows)
+        for name, bound, estimated_rows in rows
+    ]
+
+
+def ensure_partitions(connection, months_ahead: int = None) -> list:
+    # Splits empty months off p_future up to `months_ahead` months after the
+    # current one; returns the partitions created
+    months_ahead = settings.SALES_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    bounds = [bound for _, bound, _ in partitions(connection) if bound is not None]
+    if not bounds:
+        return []
+    months = _months(month_start(max(bounds)), add_months(month_start(date.today()), months_ahead))
+    if months:
+        connection.execute(text(
+            f"ALTER TABLE sales REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({_partition_clauses(months)})"
+        ))
+    return [partition_name(month) for month in months]
+
+
+# ---------- Archiving ----------
+# A closed period is a month before `before`: a monthly partition on MySQL,
+# a calendar month of the plain table otherwise. Each is archived in turn:
+#   1. its daily rollups are rebuilt from its rows, so they are exact;
+#   2. its rows are written, in id order, to <directory>/sales-YYYY-MM.csv.gz
+#      (or .parquet), and the row count is checked;
+#   3. a sales_archives row records the file and the period's totals;
+#   4. the partition is dropped (MySQL, when no sales were added to it
+#      since step 2) or the archived rows deleted in chunks.
+# Archived periods keep their rollups, so revenue summaries and comparisons
+# still cover them; `rollups rebuild` leaves them alone. Re-running resumes
+# a period whose rows were archived but not yet removed. Sales backdated
+# into a period after it was archived are left in place and reported.
+
+def closed_periods(connection, before: date) -> list:
+    # (label, start or None, end) per period, oldest first
+    cutoff = datetime.combine(before, time.min)
+    bounds = [bound for _, bound, _ in partitions(connection) if bound is not None]
+    if bounds:
+        starts = [None] + bounds[:-1]
+        return [
+            (f"{add_months(month_start(end), -1):%Y-%m}", start, end)
+            for start, end in zip(starts, bounds) if end <= cutoff
+        ]
+
+    first = connection.execute(select(func.min(models.Sale.date)).where(*sales_between(end=cutoff, end_exclusive=True))).scalar()
+    if first is None:
+        return []
+    return [
+        (f"{month:%Y-%m}", datetime.combine(month, time.min), datetime.combine(add_months(month, 1), time.min))
+        for month in _months(month_start(first), add_months(before, -1))
+    ]
+
+
+def _write_archive(connection, conditions: list, path: str, export_format: str) -> tuple:
+    # Returns the rows written and the highest id among them
+    written, last_id = 0, 0
+
+    def chunks():
+        nonlocal written, last_id
+        statement = select(*(getattr(models.Sale, name) for name, _ in ARCHIVE_COLUMNS)) \
+            .where(*conditions).order_by(models.Sale.id)
+        result = connection.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(statement)
+        for rows in result.partitions():
+            written += len(rows)
+            last_id = rows[-1][0]
+            yield rows
+
+    partial = path + ".partial"
+    with (gzip.open(partial, "wb") if export_format == "csv" else open(partial, "wb")) as file:
+        writer = write_csv if export_format == "csv" else write_parquet
+        for data in writer(ARCHIVE_COLUMNS, chunks()):
+            file.write(data)
+    os.replace(partial, path)
+    return written, last_id
+
+
+def _remove_period(label: str, start, end, last_id: int):
+    # Removes the period's archived rows (ids up to `last_id`); sales added to
+    # the period since it was archived are kept and reported
+    conditions = sales_between(start, end, end_exclusive=True)
+    with engine.begin() as connection:
+        added = connection.execute(
+            select(func.count()).select_from(models.Sale).where(*conditions, models.Sale.id > last_id)
+        ).scalar()
+        partition = next((name for name, bound, _ in partitions(connection) if bound == end), None)
+        if partition and not added:
+            connection.execute(text(f"ALTER TABLE sales DROP PARTITION {partition}"))
+            return
+
+    # No partition to drop, or one holding sales added since: delete the
+    # archived rows in chunks, one short transaction each, so the delete
+    # never holds locks for long
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(
+                select(models.Sale.id).where(*conditions, models.Sale.id <= last_id).limit(DELETE_CHUNK_ROWS)
+            ).scalars().all()
+            if not ids:
+                break
+            connection.execute(delete(models.Sale).where(models.Sale.id.in_(ids)))
+    if added:
+        logger.warning("%s: %d sales were added after it was archived and were left in place", label, added)
+
+
+def archive_period(label: str, start, end, directory: str, export_format: str = "csv"):
+    # Returns the sales_archives row written, or None for an empty period
+    conditions = sales_between(start, end, end_exclusive=True)
+    db = SessionLocal()
+    try:
+        archived = db.get(models.SalesArchive, label)
+        if archived is None:
+            rebuild(db, since=start.date() if start else None, until=end.date() - timedelta(days=1))
+            rows, quantity, revenue = db.execute(select(
+                func.count(), func.coalesce(func.sum(models.Sale.quantity), 0),
+                func.coalesce(func.sum(models.Sale.quantity * models.Sale.unit_price), 0)
+            ).where(*conditions)).one()
+            if not rows:
+                db.commit()
+                return None
+
+            path = os.path.join(directory, f"sales-{label}.{'csv.gz' if export_format == 'csv' else 'parquet'}")
+            written, last_id = _write_archive(db.connection(), conditions, path, export_format)
+            if written != rows:
+                raise RuntimeError(f"{label}: wrote {written} sales to {path}, expected {rows}")
+            archived = models.SalesArchive(
+                period=label, start=start, end=end, path=os.path.abspath(path), rows=rows,
+                last_id=last_id, quantity=quantity, revenue=revenue, archived_at=datetime.utcnow()
+            )
+            db.add(archived)
+            db.commit()
+        _remove_period(label, start, end, archived.last_id)
+        return archived
+    finally:
+        db.close()
+
+
+def archive(before: date, directory: str, export_format: str = "csv") -> list:
+    os.makedirs(directory, exist_ok=True)
+    with engine.connect() as connection:
+        periods = closed_periods(connection, before)
+    return [
+        archived for archived in (archive_period(label, start, end, directory, export_format) for label, start, end in periods)
+        if archived is not None
+    ]
+
+
+# ---------- Pruning check ----------
+
+def explain_partitions(connection, conditions: list) -> str:
+    # Partitions MySQL reads for a SELECT on sales with `conditions`
+    statement = select(models.Sale.id).where(*conditions)
+    compiled = statement.compile(connection, compile_kwargs={"literal_binds": True})
+    row = connection.execute(text(f"EXPLAIN {compiled}")).mappings().first()
+    return row.get("partitions") or ""
+
+
+def _parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain monthly sales partitions and archive closed months")
+    parser.add_argument("command", choices=["status", "ensure", "archive", "check"])
+    parser.add_argument("--months-ahead", type=int, help="Monthly partitions to keep ready after the current month")
+    parser.add_argument("--before", type=_parse_month, help="Archive months before this one (YYYY-MM); "
+                                                           "default: SALES_ARCHIVE_AFTER_MONTHS before the current month")
+    parser.add_argument("--to", default=settings.SALES_ARCHIVE_DIR, help="Directory for archive files")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = parser.parse_args()
+    # status and check only read; the others need the migrated schema, which
+    # is only ever changed by python -m app.migrate upgrade
+    if args.command in ("ensure", "archive"):
+        problem = migrate.schema_out_of_date(engine)
+        if problem:
+            parser.error(problem)
+    this_month = month_start(date.today())
+
+    if args.command == "ensure":
+        with engine.begin() as connection:
+            if connection.dialect.name != "mysql":
+                print("Only MySQL partitions sales; nothing to do.")
+            else:
+                created = ensure_partitions(connection, args.months_ahead)
+                print(f"Created partitions: {', '.join(created)}." if created else "Partitions are up to date.")
+    elif args.command == "archive":
+        before = args.before or add_months(this_month, -settings.SALES_ARCHIVE_AFTER_MONTHS)
+        if before > this_month:
+            parser.error("--before must not be after the current month")
+        if args.format == "parquet" and pyarrow is None:
+            parser.error("Parquet archives require pyarrow to be installed")
+        for archived in archive(before, args.to, args.format):
+            print(f"{archived.period}: {archived.rows} sales, revenue {archived.revenue} -> {archived.path}")
+    elif args.command == "check":
+        with engine.connect() as connection:
+            if connection.dialect.name != "mysql":
+                parser.error("check needs a MySQL database")
+            last_month = add_months(this_month, -1)
+            checks = {
+                "last month": sales_between(last_month, this_month, end_exclusive=True),
+                "since last month": sales_between(last_month),
+                "one day": sales_between(datetime.combine(last_month, time.min), datetime.combine(last_month, time.max)),
+            }
+            for name, conditions in checks.items():
+                print(f"{name:<18} {explain_partitions(connection, conditions)}")
+    else:
+        with engine.connect() as connection:
+            for name, bound, estimated_rows in partitions(connection):
+                print(f"{name:<10} < {bound or 'MAXVALUE'}  ~{estimated_rows} rows")
+            archives = models.SalesArchive.__table__
+            if not inspect(connection).has_table(archives.name):
+                print(f"No {archives.name} table yet: run python -m app.migrate upgrade")
+            else:
+                for archived in connection.execute(archives.select().order_by(archives.c.period)):
+                    print(f"archived {archived.period}: {archived.rows} sales, revenue {archived.revenue} -> {archived.path}")
@@ -0,0 +1,134 @@
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app import migrate
+from app.database import SessionLocal, engine, upsert
+from app.models import models
+
+daily_product = models.SalesDailyProduct.__table__
+daily_category = models.SalesDailyCategory.__table__
+
+
+# ---------- Incremental maintenance ----------
+
+def _increment(table):
+    return lambda inserted: {
+        "quantity": table.c.quantity + inserted.quantity,
+        "revenue": table.c.revenue + inserted.revenue,
+    }
+
+def record_sales(db: Session, sales):
+    # `sales` are dicts with date, product_id, category_id, quantity and
+    # unit_price. Must run inside the transaction that inserts them.
+    per_product = defaultdict(lambda: [0, Decimal(0)])
+    per_category = defaultdict(lambda: [0, Decimal(0)])
+    for sale in sales:
+        day = sale["date"].date()
+        revenue = sale["quantity"] * Decimal(sale["unit_price"])
+
+        totals = per_product[(day, sale["product_id"])]
+        totals[0] += sale["quantity"]
+        totals[1] += revenue
+
+        if sale["category_id"] is not None:
+            totals = per_category[(day, sale["category_id"])]
+            totals[0] += sale["quantity"]
+            totals[1] += revenue
+
+    upsert(db, daily_product, [
+        {"day": day, "product_id": product_id, "quantity": quantity, "revenue": revenue}
+        for (day, product_id), (quantity, revenue) in per_product.items()
+    ], keys=["day", "product_id"], values=_increment(daily_product))
+    upsert(db, daily_category, [
+        {"day": day, "category_id": category_id, "quantity": quantity, "revenue": revenue}
+        for (day, category_id), (quantity, revenue) in per_category.items()
+    ], keys=["day", "category_id"], values=_increment(daily_category))
+
+
+# ---------- Queries ----------
+
+def period_label(day: date, range_type: str):
+    if range_type == "daily":
+        return day
+    if range_type == "weekly":
+        # Same numbering as MySQL WEEK(date): weeks start on Sunday, days
+        # before the first Sunday of the year are week 0
+        return f"{day.year}-W{int(day.strftime('%U'))}"
+    if range_type == "monthly":
+        return f"{day.year}-{day.month}"
+    if range_type == "yearly":
+        return day.year
+    raise ValueError(range_type)
+
+def full_days(start: datetime, end: datetime):
+    # First and last day wholly inside [start, end]; the partial days at
+    # either edge have to come from raw sales
+    first = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    last = (end + timedelta(microseconds=1)).date() - timedelta(days=1)
+    return first, last
+
+
+# ---------- Backfill ----------
+
+def rebuild(db: Session, since: date = None, until: date = None):
+    # Rebuilds the days from `since` through `until` (default: all). Days in
+    # archived periods have no sales rows left, so their rollups are kept.
+    archived_until = db.query(func.max(models.SalesArchive.end)).scalar()
+    if archived_until and (since is None or since < archived_until.date()):
+        since = archived_until.date()
+    if since and until and since > until:
+        return
+
+    sale_day = func.date(models.Sale.date)
+    revenue = func.sum(models.Sale.quantity * models.Sale.unit_price)
+
+    product_rows = select(sale_day, models.Sale.product_id, func.sum(models.Sale.quantity), revenue) \
+        .group_by(sale_day, models.Sale.product_id)
+    category_rows = select(sale_day, models.Product.category_id, func.sum(models.Sale.quantity), revenue) \
+        .join(models.Product, models.Product.id == models.Sale.product_id) \
+        .where(models.Product.category_id.isnot(None)) \
+        .group_by(sale_day, models.Product.category_id)
+
+    clear_product = delete(daily_product)
+    clear_category = delete(daily_category)
+    if since:
+        since_start = datetime.combine(since, time.min)
+        product_rows = product_rows.where(models.Sale.date >= since_start)
+        category_rows = category_rows.where(models.Sale.date >= since_start)
+        clear_product = clear_product.where(daily_product.c.day >= since)
+        clear_category = clear_category.where(daily_category.c.day >= since)
+    if until:
+        until_end = datetime.combine(until + timedelta(days=1), time.min)
+        product_rows = product_rows.where(models.Sale.date < until_end)
+        category_rows = category_rows.where(models.Sale.date < until_end)
+        clear_product = clear_product.where(daily_product.c.day <= until)
+        clear_category = clear_category.where(daily_category.c.day <= until)
+
+    db.execute(clear_product)
+    db.execute(clear_category)
+    db.execute(insert(daily_product).from_select(["day", "product_id", "quantity", "revenue"], product_rows))
+    db.execute(insert(daily_category).from_select(["day", "category_id", "quantity", "revenue"], category_rows))
+    db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily revenue rollups from the sales table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--since", type=date.fromisoformat, help="Only rebuild days from this date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Only rebuild days up to this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    problem = migrate.schema_out_of_date(engine)
+    if problem:
+        parser.error(problem)
+    db = SessionLocal()
+    try:
+        rebuild(db, since=args.since, until=args.until)
+    finally:
+        db.close()
+    print("Rollups rebuilt.")
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.cache import response_cache
+from app.config import settings
+from app.database import async_read_replicas, get_read_db, read_replicas
+from app.instrumentation import pool_metrics, slow_queries
+from app.models import models
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"]
+)
+
+# ---------- Response Cache Stats ----------
+@router.get("/cache")
+def cache_stats():
+    return response_cache.stats()
+
+# ---------- Clear Response Cache ----------
+@router.delete("/cache", status_code=204)
+def clear_cache():
+    response_cache.clear()
+
+# ---------- Connection Pool Metrics ----------
+@router.get("/pool")
+def pool_stats():
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+# ---------- Read Replica Health ----------
+@router.get("/replicas")
+def replica_status():
+    replicas = async_read_replicas if settings.DB_MODE == "async" else read_replicas
+    return replicas.status()
+
+# ---------- Slow Queries ----------
+@router.get("/slow-queries")
+def slow_query_stats():
+    return slow_queries.snapshot()
+
+# ---------- Clear Slow Queries ----------
+@router.delete("/slow-queries", status_code=204)
+def clear_slow_queries():
+    slow_queries.clear()
+
+# ---------- Sales Archives ----------
+@router.get("/sales-archives")
+def sales_archives(db: Session = Depends(get_read_db)):
+    archives = db.query(models.SalesArchive).order_by(models.SalesArchive.period).all()
+    return [
+        {
+            "period": archive.period, "start": archive.start, "end": archive.end, "path": archive.path,
+            "rows": archive.rows, "last_id": archive.last_id, "quantity": archive.quantity, "revenue": archive.revenue,
+            "archived_at": archive.archived_at,
+        }
+        for archive in archives
+    ]
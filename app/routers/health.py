@@ -0,0 +1,46 @@
+import os
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc
+from app import migrate
+from app.database import engine
+from app.lifecycle import startup
+
+router = APIRouter(
+    prefix="/health",
+    tags=["Health"]
+)
+
+# ---------- Liveness ----------
+@router.get("/live")
+def live():
+    return {"status": "ok"}
+
+# ---------- Readiness ----------
+# 200 once this worker has started, can reach the primary database and the
+# schema is at the latest migration; 503 with the reasons otherwise. Checked
+# on every call, so a worker that started before the database was reachable
+# or migrated becomes ready without a restart.
+@router.get("/ready")
+def ready():
+    problems = []
+    schema_version = None
+    if not startup.ready:
+        problems.append("starting")
+    try:
+        with engine.connect() as connection:
+            schema_version = migrate.current_version(connection)
+        if schema_version < migrate.head_version():
+            problems.append(f"schema version {schema_version}, expected {migrate.head_version()}")
+    except exc.DBAPIError as error:
+        problems.append(f"primary database unavailable: {error.orig}")
+
+    content = {
+        "status": "not ready" if problems else "ready",
+        "pid": os.getpid(),
+        "startup_seconds": startup.seconds,
+        "schema_version": schema_version,
+    }
+    if problems:
+        return JSONResponse(status_code=503, content={**content, "problems": problems})
+    return content
@@ -1,9 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from sqlalchemy import and_
-from app.database import get_db
+from app.cache import cached, table_versions
+from app.catalog import catalog
+from app.database import SessionLocal, get_db, get_read_db, read_replicas, upsert
+from app.fieldsets import load_options, parse_fieldset, relation_requested, tables_read
+from app.imports import import_error, run_import, spool_body
+from app.instrumentation import query_budget
 from app.models import models
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 from app.schemas import schemas
+from app.search import category_name_filter, product_name_filter, sku_filter
+from app.serialization import json_response
+from app.stock_index import stock_index
+from datetime import datetime
+import asyncio
+import json
 
 router = APIRouter(
     prefix="/inventory",
@@ -11,29 +25,38 @@ router = APIRouter(
 )
 
 # ---------- GET: View & Filter Inventory ----------
-@router.get("/", response_model=list[schemas.Inventory])
+@router.get("/", response_model=schemas.Page[schemas.Inventory],
+            dependencies=[Depends(query_budget(1)), Depends(cached("inventory", "products", "categories"))])
 def get_inventory(
     product_name: str = Query(default=None),
     category_name: str = Query(default=None),
     sku: str = Query(default=None),
+    sku_contains: str = Query(default=None),
     min_qty: int = Query(default=None),
     max_qty: int = Query(default=None),
     sort_by: str = Query(default="last_updated"),
     sort_order: str = Query(default="desc"),
-    db: Session = Depends(get_db)
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(default=None),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. product_id,quantity,product.name"),
+    expand: str = Query(default=None, description="Comma-separated relations to include: product, product.category"),
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Inventory).join(models.Product)
+    fieldset = parse_fieldset(models.Inventory, schemas.Inventory, fields, expand)
 
+    filters = []
     if product_name:
-        query = query.filter(models.Product.name.ilike(f"%{product_name}%"))
+        filters.append(product_name_filter(db, product_name, models.Inventory.product_id))
     if category_name:
-        query = query.join(models.Category).filter(models.Category.name.ilike(f"%{category_name}%"))
+        filters.append(category_name_filter(db, category_name))
     if sku:
-        query = query.filter(models.Product.sku == sku)
+        filters.append(models.Product.sku == sku)
+    if sku_contains:
+        filters.append(sku_filter(db, sku_contains, models.Inventory.product_id))
     if min_qty is not None:
-        query = query.filter(models.Inventory.quantity >= min_qty)
+        filters.append(models.Inventory.quantity >= min_qty)
     if max_qty is not None:
-        query = query.filter(models.Inventory.quantity <= max_qty)
+        filters.append(models.Inventory.quantity <= max_qty)
 
     allowed_sort_fields = {
         "quantity": models.Inventory.quantity,
@@ -41,21 +64,143 @@ def get_inventory(
         "product_name": models.Product.name
     }
 
-    sort_column = allowed_sort_fields.get(sort_by, models.Inventory.last_updated)
-    query = query.order_by(sort_column.desc() if sort_order == "desc" else sort_column.asc())
+    if sort_by not in allowed_sort_fields:
+        sort_by = "last_updated"
 
-    return query.all()
+    # Loading plan: Inventory.product -> Product.category from the same joins,
+    # made only when the response, a filter or the sort reads them
+    tables = tables_read(filters)
+    join_categories = relation_requested(fieldset, "product.category") or "categories" in tables
+    query = db.query(models.Inventory)
+    if join_categories or relation_requested(fieldset, "product") or "products" in tables or sort_by == "product_name":
+        query = query.join(models.Inventory.product)
+    if join_categories:
+        query = query.outerjoin(models.Product.category)
+    query = query.filter(*filters).options(*load_options(models.Inventory, fieldset, {
+        "product": contains_eager,
+        "product.category": contains_eager
+    }))
+    descending = sort_order == "desc"
+
+    return json_response(schemas.Page[schemas.Inventory], paginate(
+        query,
+        sort_key=f"{sort_by}:{'desc' if descending else 'asc'}",
+        sort_column=allowed_sort_fields[sort_by],
+        id_column=models.Inventory.id,
+        descending=descending,
+        limit=limit,
+        cursor=cursor
+    ), fieldset)
 
 # ---------- GET: Low Stock Alert ----------
-@router.get("/low-stock", response_model=list[schemas.Inventory])
-def low_stock(threshold: int = 5, db: Session = Depends(get_db)):
-    return db.query(models.Inventory).filter(models.Inventory.quantity <= threshold).all()
+@router.get("/low-stock", response_model=list[schemas.Inventory],
+            dependencies=[Depends(query_budget(1)), Depends(cached("inventory", "products", "categories"))])
+def low_stock(threshold: int = 5, db: Session = Depends(get_read_db)):
+    # Matching products come from the in-memory stock index; rows are then
+    # fetched by key, re-checking the quantity in case the index lags
+    product_ids = stock_index.low_stock(db, threshold)
+    if not product_ids:
+        return json_response(list[schemas.Inventory], [])
+    return json_response(list[schemas.Inventory], db.query(models.Inventory)
+        .options(joinedload(models.Inventory.product).joinedload(models.Product.category))
+        .filter(models.Inventory.product_id.in_(product_ids), models.Inventory.quantity <= threshold).all())
+
+# ---------- GET: Low Stock Alerts (Server-Sent Events) ----------
+LOW_STOCK_KEEPALIVE_SECONDS = 15
+
+@router.get("/low-stock/stream")
+async def low_stock_stream(threshold: int = 5):
+    # One event per product crossing `threshold` in either direction:
+    #   event: low_stock | restocked
+    #   data: {"product_id", "quantity", "previous_quantity", "threshold"}
+    # Keep-alive comments double as the reload tick for other workers' writes;
+    # the generator is cancelled when the client disconnects.
+    def refresh():
+        connection = read_replicas.connect()
+        db = SessionLocal(bind=connection)
+        try:
+            stock_index.refresh(db)
+        finally:
+            db.close()
+            connection.close()
+
+    await run_in_threadpool(refresh)
+
+    async def events():
+        queue = stock_index.subscribe(threshold)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), LOW_STOCK_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    await run_in_threadpool(refresh)
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event.pop('event')}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            stock_index.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# ---------- POST: Bulk Import Inventory (CSV / NDJSON) ----------
+def _product_ids(db: Session, chunk: list) -> dict:
+    # Product id for each line whose SKU or product_id exists, through the
+    # catalog cache: at most one lookup by SKU and one by id
+    by_sku = catalog.products_by_sku(db, {row.sku for _, row in chunk if row.sku})
+    by_id = catalog.products(db, {row.product_id for _, row in chunk if not row.sku and row.product_id is not None})
+
+    resolved = {}
+    for line_no, row in chunk:
+        product = by_sku.get(row.sku) if row.sku else by_id.get(row.product_id)
+        if product is not None:
+            resolved[line_no] = product.id
+    return resolved
+
+def _upsert_inventory(db: Session, chunk: list) -> list:
+    product_ids = _product_ids(db, chunk)
+    now = datetime.utcnow()
+    rows, errors = [], []
+    for line_no, row in chunk:
+        if line_no not in product_ids:
+            errors.append(import_error(line_no, "Product not found"))
+            continue
+        rows.append({"product_id": product_ids[line_no], "quantity": row.quantity, "last_updated": now})
+
+    inventory = models.Inventory.__table__
+    upsert(db, inventory, rows, keys=["product_id"], values=lambda inserted: {
+        "quantity": inserted.quantity,
+        "last_updated": inserted.last_updated
+    })
+    return errors
+
+def _index_inventory(db: Session, chunk: list):
+    product_ids = _product_ids(db, chunk)
+    stock_index.set_quantities({
+        product_ids[line_no]: row.quantity for line_no, row in chunk if line_no in product_ids
+    })
+
+@router.post("/import")
+async def import_inventory(
+    request: Request,
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(default=1000, ge=1, le=10000, description="Rows per transaction")
+):
+    # Body: CSV with a header row, or NDJSON, of schemas.InventoryImportRow.
+    # Sets the stock level of each product, creating its inventory row if needed.
+    upload = await spool_body(request)
+    try:
+        report = await run_in_threadpool(
+            run_import, upload, format, schemas.InventoryImportRow, _upsert_inventory, chunk_size, _index_inventory
+        )
+    finally:
+        upload.close()
+    table_versions.bump("inventory")
+    return report
 
 # ---------- POST: Add or Update Inventory ----------
 @router.post("/", response_model=schemas.Inventory)
 def upsert_inventory(payload: schemas.InventoryCreate, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == payload.product_id).first()
-    if not product:
+    if payload.product_id not in catalog.products(db, [payload.product_id]):
         raise HTTPException(status_code=404, detail="Product not found")
 
     inventory = db.query(models.Inventory).filter(models.Inventory.product_id == payload.product_id).first()
@@ -66,5 +211,7 @@ def upsert_inventory(payload: schemas.InventoryCreate, db: Session = Depends(get
         db.add(inventory)
 
     db.commit()
+    table_versions.bump("inventory")
+    stock_index.set_quantities({payload.product_id: payload.quantity})
     db.refresh(inventory)
     return inventory
\ No newline at end of file
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from app.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+
+router = APIRouter(
+    tags=["Metrics"]
+)
+
+# ---------- Prometheus Metrics ----------
+@router.get("/metrics")
+def metrics():
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
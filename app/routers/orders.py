@@ -1,9 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from app.cache import table_versions
+from app.database import SessionLocal, get_db, get_read_db
+from app.export import export_response
+from app.fieldsets import load_options, parse_fieldset
+from app.instrumentation import logger, query_budget
 from app.models import models
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.rollups import record_sales
 from app.schemas import schemas
+from app.serialization import json_response
+from app.stock import decrement_stock, load_stock, oversell_allowed
+from app.stock_index import stock_index
+import json
+from collections import defaultdict
 from datetime import datetime
 
 router = APIRouter(
@@ -11,63 +27,283 @@ router = APIRouter(
     tags=["Orders"]
 )
 
+# Loading plan for schemas.Order: Order.sales -> Sale.product -> Product.category
+# in one extra SELECT per page of orders
+order_loaders = {
+    "sales": selectinload,
+    "sales.product": joinedload,
+    "sales.product.category": joinedload
+}
+order_load_options = load_options(models.Order, None, order_loaders)
+
+# ---------- Order placement ----------
+
+def place_orders(db: Session, payloads: list) -> list:
+    # Places a batch of orders in one transaction with one stock lookup, one
+    # stock UPDATE and one sales insert. Returns, per payload, the new order id
+    # or the HTTPException that rejected it; rejected orders change nothing.
+    # Returns None, with nothing written, if stock moved under a batch of
+    # several orders; the caller then places each order on its own.
+    stock = load_stock(db, {item.product_id for payload in payloads for item in payload.sales})
+    available = {product_id: row.quantity for product_id, row in stock.items()}
+
+    results = []
+    accepted = []
+    decrements = defaultdict(int)
+    for payload in payloads:
+        quantities = defaultdict(int)
+        for item in payload.sales:
+            quantities[item.product_id] += item.quantity
+
+        error = None
+        for product_id, quantity in quantities.items():
+            if product_id not in stock:
+                error = HTTPException(status_code=404, detail=f"Product {product_id} not found")
+                break
+            if available[product_id] is not None and available[product_id] < quantity and not oversell_allowed():
+                error = HTTPException(status_code=409, detail=f"Insufficient stock for product {product_id}")
+                break
+        if error:
+            results.append(error)
+            continue
+
+        for product_id, quantity in quantities.items():
+            if available[product_id] is not None:
+                available[product_id] -= quantity
+                decrements[product_id] += quantity
+        accepted.append((len(results), payload))
+        results.append(None)
+
+    # Adjust inventory; unless overselling is allowed the UPDATE re-checks
+    # stock, so concurrent orders cannot oversell
+    if not decrement_stock(db, decrements):
+        db.rollback()
+        if len(payloads) == 1:
+            return [HTTPException(status_code=409, detail="Insufficient stock")]
+        return None
+
+    if not accepted:
+        db.rollback()
+        return results
+
+    # Create the orders
+    now = datetime.utcnow()
+    orders = [
+        models.Order(
+            customer_name=payload.customer_name,
+            customer_email=payload.customer_email,
+            total_amount=sum(item.quantity * stock[item.product_id].price for item in payload.sales),
+            created_at=now
+        )
+        for _, payload in accepted
+    ]
+    db.add_all(orders)
+    db.flush()  # assign order ids before inserting sales
+
+    # Insert all sales in one executemany
+    sales = [
+        {
+            "order_id": order.id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "unit_price": stock[item.product_id].price,
+            "date": now
+        }
+        for order, (_, payload) in zip(orders, accepted)
+        for item in payload.sales
+    ]
+    db.execute(insert(models.Sale), sales)
+    record_sales(db, [
+        dict(sale, category_id=stock[sale["product_id"]].category_id) for sale in sales
+    ])
+
+    for order, (index, _) in zip(orders, accepted):
+        results[index] = order.id
+    db.commit()
+    table_versions.bump("orders", "sales", "inventory")
+    stock_index.apply_deltas({product_id: -quantity for product_id, quantity in decrements.items()})
+    return results
+
 # ---------- POST: Create Order with Items ----------
-@router.post("/", response_model=schemas.Order)
+@router.post("/", response_model=schemas.Order, dependencies=[Depends(query_budget(8))])
 def create_order(payload: schemas.OrderCreate, db: Session = Depends(get_db)):
-    total_amount = 0
-    sales = []
-
-    # Validate all products and compute total
-    for item in payload.sales:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-
-        line_total = item.quantity * product.price
-        total_amount += line_total
-
-        sale = models.Sale(
-            product_id=item.product_id,
-            quantity=item.quantity,
-            unit_price=product.price,
-            date=datetime.utcnow()
-        )
-        sales.append(sale)
-
-        # Adjust inventory
-        inventory = db.query(models.Inventory).filter(models.Inventory.product_id == item.product_id).first()
-        if inventory:
-            inventory.quantity -= item.quantity
-
-    # Create the order
-    order = models.Order(
-        customer_name=payload.customer_name,
-        customer_email=payload.customer_email,
-        total_amount=total_amount,
-        created_at=datetime.utcnow()
+    result = place_orders(db, [payload])[0]
+    if isinstance(result, HTTPException):
+        raise result
+    return db.query(models.Order).options(*order_load_options).filter(models.Order.id == result).one()
+
+# ---------- POST: Bulk Create Orders (NDJSON) ----------
+# Longest accepted line; longer lines get a 413 result line and are dropped
+# as they arrive, so memory stays bounded whatever the body holds
+ORDER_LINE_MAX_BYTES = 64 * 1024
+
+async def _ndjson_lines(request: Request):
+    # Each line of the body, or None for a line over ORDER_LINE_MAX_BYTES.
+    # Only the new bytes of each chunk are searched for newlines.
+    line, overlong = bytearray(), False
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if not overlong:
+                line += chunk[start:] if end < 0 else chunk[start:end]
+                if len(line) > ORDER_LINE_MAX_BYTES:
+                    line.clear()
+                    overlong = True
+            if end < 0:
+                break
+            yield None if overlong else bytes(line)
+            line.clear()
+            overlong = False
+            start = end + 1
+    if overlong or line:
+        yield None if overlong else bytes(line)
+
+def _result_line(line_no: int, order_id: int = None, error: HTTPException = None) -> bytes:
+    if error is not None:
+        result = {"line": line_no, "status_code": error.status_code, "error": error.detail}
+    else:
+        result = {"line": line_no, "status_code": 201, "order_id": order_id}
+    return json.dumps(result, default=str).encode() + b"\n"
+
+def _failure(exc: Exception) -> HTTPException:
+    return HTTPException(status_code=500, detail="Database error" if isinstance(exc, SQLAlchemyError) else "Internal error")
+
+def _place_alone(db: Session, payload):
+    try:
+        return place_orders(db, [payload])[0]
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Bulk order failed")
+        return _failure(exc)
+
+def _place_chunk(db: Session, chunk: list) -> bytes:
+    # Result lines for a chunk placed in one transaction. If the chunk cannot
+    # be placed as a whole (stock moved, or any error), each order is placed in
+    # its own transaction, so every line reports exactly what was committed.
+    payloads = [payload for _, payload in chunk]
+    try:
+        results = place_orders(db, payloads)
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Bulk order chunk failed")
+        results = [_failure(exc)] if len(payloads) == 1 else None
+    if results is None:
+        results = [_place_alone(db, payload) for payload in payloads]
+    return b"".join(
+        _result_line(line_no, error=result) if isinstance(result, HTTPException) else _result_line(line_no, order_id=result)
+        for (line_no, _), result in zip(chunk, results)
     )
 
-    db.add(order)
-    db.flush()  # assign order.id before inserting sales
+class _ConcurrentStreamingResponse(StreamingResponse):
+    # Sends the body while the handler is still reading the request body.
+    # StreamingResponse would also wait on `receive` for a disconnect, taking
+    # body messages meant for request.stream(); a disconnect shows up there
+    # as ClientDisconnect instead.
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
 
-    # Assign order_id to sales and save
-    for s in sales:
-        s.order_id = order.id
-        db.add(s)
+@router.post("/bulk")
+async def bulk_create_orders(
+    request: Request,
+    chunk_size: int = Query(default=500, ge=1, le=5000, description="Orders per transaction")
+):
+    # Body: one schemas.OrderCreate JSON object per line. Chunks are placed
+    # while the body is still uploading, and each chunk's result lines are
+    # sent as soon as it commits: one line per input line, with the order id
+    # or the error. A client that loses the connection keeps the results of
+    # everything committed so far, and the unfinished chunk is not placed.
+    async def results():
+        db = SessionLocal()
+        try:
+            chunk = []
+            line_no = 0
+            async for line in _ndjson_lines(request):
+                line_no += 1
+                if line is None:
+                    yield _result_line(line_no, error=HTTPException(
+                        status_code=413, detail=f"Line longer than {ORDER_LINE_MAX_BYTES} bytes"
+                    ))
+                    continue
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append((line_no, schemas.OrderCreate.model_validate_json(line)))
+                except ValidationError as exc:
+                    yield _result_line(line_no, error=HTTPException(
+                        status_code=422, detail=exc.errors(include_url=False, include_context=False, include_input=False)
+                    ))
+                    continue
 
-    db.commit()
-    db.refresh(order)
-    return order
+                if len(chunk) >= chunk_size:
+                    yield await run_in_threadpool(_place_chunk, db, chunk)
+                    chunk = []
+
+            if chunk:
+                yield await run_in_threadpool(_place_chunk, db, chunk)
+        except ClientDisconnect:
+            logger.warning("Client disconnected during POST /orders/bulk after line %d", line_no)
+        finally:
+            await run_in_threadpool(db.close)
+
+    return _ConcurrentStreamingResponse(results(), media_type="application/x-ndjson")
 
 # ---------- GET: All Orders ----------
-@router.get("/", response_model=list[schemas.Order])
-def list_orders(db: Session = Depends(get_db)):
-    return db.query(models.Order).all()
+@router.get("/", response_model=schemas.Page[schemas.Order], dependencies=[Depends(query_budget(2))])
+def list_orders(
+    sort_order: str = Query(default="desc", description="Sort by creation date: asc or desc"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(default=None),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. id,total_amount,sales.quantity"),
+    expand: str = Query(default=None, description="Comma-separated relations to include: sales, sales.product, sales.product.category"),
+    db: Session = Depends(get_read_db)
+):
+    fieldset = parse_fieldset(models.Order, schemas.Order, fields, expand)
+    descending = sort_order == "desc"
+    return json_response(schemas.Page[schemas.Order], paginate(
+        db.query(models.Order).options(*load_options(models.Order, fieldset, order_loaders)),
+        sort_key=f"created_at:{'desc' if descending else 'asc'}",
+        sort_column=models.Order.created_at,
+        id_column=models.Order.id,
+        descending=descending,
+        limit=limit,
+        cursor=cursor
+    ), fieldset)
+
+# ---------- GET: Export Orders (CSV / NDJSON / Parquet) ----------
+ORDER_EXPORT_COLUMNS = [
+    ("id", "int"), ("created_at", "datetime"), ("customer_name", "str"),
+    ("customer_email", "str"), ("total_amount", "decimal"),
+]
+
+@router.get("/export")
+def export_orders(
+    format: str = Query(default="csv", pattern="^(csv|ndjson|parquet)$"),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    after_id: int = Query(default=None, description="Resume after the last order id received")
+):
+    # Order lines are in the sales export, keyed by order_id
+    def build_statement(db: Session):
+        statement = select(
+            models.Order.id, models.Order.created_at, models.Order.customer_name,
+            models.Order.customer_email, models.Order.total_amount
+        ).order_by(models.Order.id)
+
+        if start_date:
+            statement = statement.where(models.Order.created_at >= start_date)
+        if end_date:
+            statement = statement.where(models.Order.created_at <= end_date)
+        if after_id is not None:
+            statement = statement.where(models.Order.id > after_id)
+        return statement
+
+    return export_response(build_statement, ORDER_EXPORT_COLUMNS, format, "orders")
 
 # ---------- GET: Order Details ----------
-@router.get("/{order_id}", response_model=schemas.Order)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+@router.get("/{order_id}", response_model=schemas.Order, dependencies=[Depends(query_budget(2))])
+def get_order(order_id: int, db: Session = Depends(get_read_db)):
+    order = db.query(models.Order).options(*order_load_options).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
\ No newline at end of file
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from sqlalchemy import and_, or_
-from app.database import get_db
+from app.cache import cached, table_versions
+from app.catalog import catalog
+from app.database import get_db, get_read_db, upsert
+from app.fieldsets import load_options, parse_fieldset, relation_requested, tables_read
+from app.imports import import_error, run_import, spool_body
+from app.instrumentation import query_budget
 from app.models import models
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, paginate_ids
 from app.schemas import schemas
+from app.search import catalog_search, category_name_filter, product_name_filter, sku_filter
+from app.serialization import json_response
 from datetime import datetime
 
 router = APIRouter(
@@ -14,58 +23,177 @@ router = APIRouter(
 # ---------- Create Product ----------
 @router.post("/", response_model=schemas.Product)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
-    category = db.query(models.Category).filter(models.Category.id == product.category_id).first()
-    if not category:
+    if product.category_id not in catalog.category_names(db, [product.category_id]):
         raise HTTPException(status_code=400, detail="Category not found")
 
     db_product = models.Product(**product.model_dump())
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    catalog_search.add_product(db_product.id, db_product.name, db_product.sku)
+    table_versions.bump("products")
     return db_product
 
+# ---------- Bulk Import Products (CSV / NDJSON) ----------
+def _upsert_products(db: Session, chunk: list) -> list:
+    # Categories for the whole chunk in one lookup
+    names = {row.category_name for _, row in chunk if row.category_name}
+    ids = {row.category_id for _, row in chunk if row.category_id is not None}
+    categories = db.query(models.Category.id, models.Category.name) \
+        .filter(or_(models.Category.name.in_(names), models.Category.id.in_(ids))).all()
+    id_by_name = {name: category_id for category_id, name in categories}
+    known_ids = {category_id for category_id, _ in categories}
+
+    now = datetime.utcnow()
+    rows, errors = [], []
+    for line_no, row in chunk:
+        category_id = id_by_name.get(row.category_name) if row.category_name else row.category_id
+        if category_id not in known_ids:
+            errors.append(import_error(line_no, "Category not found"))
+            continue
+        rows.append({
+            "sku": row.sku,
+            "name": row.name,
+            "price": row.price,
+            "description": row.description,
+            "category_id": category_id,
+            "created_at": now,
+            "updated_at": now
+        })
+
+    products = models.Product.__table__
+    upsert(db, products, rows, keys=["sku"], values=lambda inserted: {
+        "name": inserted.name,
+        "price": inserted.price,
+        "description": inserted.description,
+        "category_id": inserted.category_id,
+        "updated_at": inserted.updated_at
+    })
+    return errors
+
+def _index_products(db: Session, chunk: list):
+    skus = [row.sku for _, row in chunk]
+    catalog.invalidate_products(skus=skus)
+    for product_id, name, sku in db.query(models.Product.id, models.Product.name, models.Product.sku) \
+            .filter(models.Product.sku.in_(skus)):
+        catalog_search.add_product(product_id, name, sku)
+
+@router.post("/import")
+async def import_products(
+    request: Request,
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(default=1000, ge=1, le=10000, description="Rows per transaction")
+):
+    # Body: CSV with a header row, or NDJSON, of schemas.ProductImportRow.
+    # Products are matched on SKU: existing ones are updated, new ones created.
+    upload = await spool_body(request)
+    try:
+        report = await run_in_threadpool(
+            run_import, upload, format, schemas.ProductImportRow, _upsert_products, chunk_size, _index_products
+        )
+    finally:
+        upload.close()
+    table_versions.bump("products")
+    return report
+
+# ---------- Get Products by IDs ----------
+# For clients that would otherwise fetch products one at a time: up to
+# MAX_PAGE_SIZE ids in one query, returned in the order asked for, with the
+# ids that don't exist listed in `missing`. Declared before /{product_id}.
+def _parse_ids(ids: str) -> list:
+    parsed = []
+    for part in ids.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            parsed.append(int(part))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid product id '{part}'")
+    if len(parsed) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+    return list(dict.fromkeys(parsed))
+
+@router.get("/batch", response_model=schemas.ProductBatch,
+            dependencies=[Depends(query_budget(1)), Depends(cached("products", "categories"))])
+def get_products_batch(
+    ids: str = Query(description="Comma-separated product ids, e.g. 1,2,3"),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. id,name,price,category.name"),
+    expand: str = Query(default=None, description="Comma-separated relations to include: category"),
+    db: Session = Depends(get_read_db)
+):
+    product_ids = _parse_ids(ids)
+    fieldset = parse_fieldset(models.Product, schemas.Product, fields, expand)
+    products = {}
+    if product_ids:
+        products = {product.id: product for product in db.query(models.Product)
+                    .options(*load_options(models.Product, fieldset, {"category": joinedload}))
+                    .filter(models.Product.id.in_(product_ids))}
+    return json_response(schemas.ProductBatch, {
+        "items": [products[product_id] for product_id in product_ids if product_id in products],
+        "missing": [product_id for product_id in product_ids if product_id not in products]
+    }, fieldset)
+
 # ---------- Get Product by ID ----------
-@router.get("/{product_id}", response_model=schemas.Product)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+@router.get("/{product_id}", response_model=schemas.Product,
+            dependencies=[Depends(query_budget(1)), Depends(cached("products", "categories"))])
+def get_product(product_id: int, db: Session = Depends(get_read_db)):
+    product = db.query(models.Product) \
+        .options(joinedload(models.Product.category)) \
+        .filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 # ---------- List/Filter Products ----------
-@router.get("/", response_model=list[schemas.Product])
+# Budget: one query, or two when ranking by relevance (matching ids, then the page)
+@router.get("/", response_model=schemas.Page[schemas.Product],
+            dependencies=[Depends(query_budget(2)), Depends(cached("products", "categories", "inventory"))])
 def list_products(
     name: str = Query(default=None, description="Filter by partial name"),
     sku: str = Query(default=None, description="Filter by exact SKU"),
+    sku_contains: str = Query(default=None, description="Filter by partial SKU"),
     category_name: str = Query(default=None, description="Filter by category name"),
     min_price: float = Query(default=None, description="Minimum price"),
     max_price: float = Query(default=None, description="Maximum price"),
     in_stock: bool = Query(default=None, description="Only products in stock"),
     created_after: datetime = Query(default=None, description="Products created after this date"),
     created_before: datetime = Query(default=None, description="Products created before this date"),
-    sort_by: str = Query(default="created_at", description="Sort by: name, price, created_at"),
+    sort_by: str = Query(default="created_at", description="Sort by: name, price, created_at, relevance (with name)"),
     sort_order: str = Query(default="desc", description="Sort direction: asc or desc"),
-    db: Session = Depends(get_db)
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: str = Query(default=None, description="next_cursor from the previous page"),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. id,name,price,category.name"),
+    expand: str = Query(default=None, description="Comma-separated relations to include: category"),
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Product)
+    fieldset = parse_fieldset(models.Product, schemas.Product, fields, expand)
 
-    # Join Category if filtering by category_name
+    # Name and category filters are resolved to ids by the in-memory search index
+    filters = []
     if category_name:
-        query = query.join(models.Category).filter(models.Category.name.ilike(f"%{category_name}%"))
-
-    # Filters
+        filters.append(category_name_filter(db, category_name))
     if name:
-        query = query.filter(models.Product.name.ilike(f"%{name}%"))
+        filters.append(product_name_filter(db, name))
     if sku:
-        query = query.filter(models.Product.sku == sku)
+        filters.append(models.Product.sku == sku)
+    if sku_contains:
+        filters.append(sku_filter(db, sku_contains))
     if min_price is not None:
-        query = query.filter(models.Product.price >= min_price)
+        filters.append(models.Product.price >= min_price)
     if max_price is not None:
-        query = query.filter(models.Product.price <= max_price)
+        filters.append(models.Product.price <= max_price)
     if created_after:
-        query = query.filter(models.Product.created_at >= created_after)
+        filters.append(models.Product.created_at >= created_after)
     if created_before:
-        query = query.filter(models.Product.created_at <= created_before)
+        filters.append(models.Product.created_at <= created_before)
+
+    # Loading plan: Product.category comes from the join used for filtering,
+    # made only when the response or a filter reads categories
+    query = db.query(models.Product)
+    if relation_requested(fieldset, "category") or "categories" in tables_read(filters):
+        query = query.outerjoin(models.Product.category)
+    query = query.filter(*filters).options(*load_options(models.Product, fieldset, {"category": contains_eager}))
 
     # Filter in_stock by joining Inventory
     if in_stock is not None:
@@ -73,6 +201,18 @@ def list_products(
             models.Inventory.quantity > 0 if in_stock else models.Inventory.quantity <= 0
         )
 
+    # Relevance order comes from the search index, not the database
+    if sort_by == "relevance" and name:
+        matching_ids = [row.id for row in query.with_entities(models.Product.id)]
+        return json_response(schemas.Page[schemas.Product], paginate_ids(
+            query,
+            catalog_search.rank_products(name, matching_ids),
+            sort_key=f"relevance:{name}",
+            id_column=models.Product.id,
+            limit=limit,
+            cursor=cursor
+        ), fieldset)
+
     # Safe sorting
     allowed_sort_fields = {
         "name": models.Product.name,
@@ -80,12 +220,16 @@ def list_products(
         "created_at": models.Product.created_at
     }
 
-    sort_column = allowed_sort_fields.get(sort_by, models.Product.created_at)
-    if sort_order == "desc":
-        sort_column = sort_column.desc()
-    else:
-        sort_column = sort_column.asc()
-
-    query = query.order_by(sort_column)
+    if sort_by not in allowed_sort_fields:
+        sort_by = "created_at"
+    descending = sort_order == "desc"
 
-    return query.all()
\ No newline at end of file
+    return json_response(schemas.Page[schemas.Product], paginate(
+        query,
+        sort_key=f"{sort_by}:{'desc' if descending else 'asc'}",
+        sort_column=allowed_sort_fields[sort_by],
+        id_column=models.Product.id,
+        descending=descending,
+        limit=limit,
+        cursor=cursor
+    ), fieldset)
\ No newline at end of file
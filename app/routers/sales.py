@@ -1,10 +1,30 @@
+from collections import defaultdict
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_
-from datetime import datetime, timedelta
-from app.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import func, extract, and_, insert, select
+from datetime import date, datetime, time, timedelta
+from app.analytics import (
+    abc_classes, daily_revenue, from_day_number, moving_averages, sales_snapshot, select_sales, sell_through,
+    top_products
+)
+from app.batching import GroupCommitQueue
+from app.cache import cached, table_versions
+from app.config import settings
+from app.database import SessionLocal, get_db, get_read_db, read_replicas
+from app.export import export_response
+from app.fieldsets import load_options, parse_fieldset, relation_requested, tables_read
+from app.instrumentation import query_budget
 from app.models import models
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.partitions import sales_between
+from app.rollups import full_days, period_label, record_sales
 from app.schemas import schemas
+from app.search import category_name_filter, product_name_filter
+from app.serialization import json_response
+from app.stock import decrement_stock, load_stock, oversell_allowed
+from app.stock_index import stock_index
 
 router = APIRouter(
     prefix="/sales",
@@ -12,12 +32,21 @@ router = APIRouter(
 )
 
 # ---------- Record Sale ----------
-@router.post("/", response_model=schemas.Sale)
 def record_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == payload.product_id).first()
+    product = load_stock(db, [payload.product_id]).get(payload.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    tracked = product.quantity is not None
+    if tracked and product.quantity < payload.quantity and not oversell_allowed():
+        raise HTTPException(status_code=409, detail=f"Insufficient stock for product {payload.product_id}")
+
+    # Decrement in the database, so concurrent sales cannot lose updates; the
+    # UPDATE re-checks stock in case a concurrent sale took it since the read
+    if tracked and not decrement_stock(db, {payload.product_id: payload.quantity}):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+
     unit_price = product.price
     sale = models.Sale(
         product_id=payload.product_id,
@@ -27,89 +56,452 @@ def record_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
         order_id=payload.order_id
     )
 
-    inventory = db.query(models.Inventory).filter(models.Inventory.product_id == payload.product_id).first()
-    if inventory:
-        inventory.quantity -= payload.quantity
-
     db.add(sale)
+    record_sales(db, [{
+        "date": sale.date,
+        "product_id": sale.product_id,
+        "category_id": product.category_id,
+        "quantity": sale.quantity,
+        "unit_price": unit_price
+    }])
     db.commit()
+    table_versions.bump("sales", "inventory")
+    if tracked:
+        stock_index.apply_deltas({payload.product_id: -payload.quantity})
     db.refresh(sale)
     return sale
 
+# ---------- Record Sale (group commit) ----------
+# With SALES_GROUP_COMMIT=true each POST /sales/ is queued and written with
+# the other sales that arrive within SALES_GROUP_COMMIT_MAX_WAIT_MS, in one
+# transaction: one read of stock, one stock UPDATE, one INSERT of the sales,
+# the rollup upserts and one commit for the whole batch. Every request still
+# gets its own sale or error back.
+
+def _insert_sales(db: Session, rows: list) -> list:
+    # Inserts all rows with one multi-row INSERT and returns their ids in row
+    # order: a single INSERT numbers its rows consecutively, in VALUES order.
+    # MySQL has no RETURNING; there LAST_INSERT_ID() is the first row's id.
+    statement = insert(models.Sale).values(rows)
+    if db.get_bind().dialect.insert_returning:
+        return sorted(db.scalars(statement.returning(models.Sale.id)))
+    first_id = db.execute(statement).lastrowid
+    return list(range(first_id, first_id + len(rows)))
+
+def _write_sale_batch(db: Session, payloads: list):
+    # Per-item results, or None if a stock re-check failed and nothing was written
+    stock = load_stock(db, {payload.product_id for payload in payloads})
+    available = {product_id: row.quantity for product_id, row in stock.items()}
+
+    results = [None] * len(payloads)
+    accepted, deltas = [], defaultdict(int)
+    for i, payload in enumerate(payloads):
+        product_id = payload.product_id
+        if product_id not in stock:
+            results[i] = HTTPException(status_code=404, detail="Product not found")
+            continue
+        if available[product_id] is not None:
+            if available[product_id] < payload.quantity and not oversell_allowed():
+                results[i] = HTTPException(status_code=409, detail=f"Insufficient stock for product {product_id}")
+                continue
+            available[product_id] -= payload.quantity
+            deltas[product_id] += payload.quantity
+        accepted.append(i)
+
+    if not decrement_stock(db, deltas):
+        db.rollback()
+        return None
+
+    if not accepted:
+        db.rollback()
+        return results
+
+    # Insert all sales in one statement and update the rollups once
+    now = datetime.utcnow()
+    sales = [
+        {
+            "product_id": payloads[i].product_id,
+            "quantity": payloads[i].quantity,
+            "unit_price": stock[payloads[i].product_id].price,
+            "date": payloads[i].date or now,
+            "order_id": payloads[i].order_id
+        }
+        for i in accepted
+    ]
+    sale_ids = _insert_sales(db, sales)
+    record_sales(db, [
+        dict(sale, category_id=stock[sale["product_id"]].category_id) for sale in sales
+    ])
+    db.commit()
+    table_versions.bump("sales", "inventory")
+    stock_index.apply_deltas({product_id: -quantity for product_id, quantity in deltas.items()})
+
+    # Built from the inserted values, so responses carry no nested product
+    for i, sale_id, sale in zip(accepted, sale_ids, sales):
+        results[i] = schemas.Sale(id=sale_id, **sale)
+    return results
+
+def record_sale_batch(payloads: list) -> list:
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        results = _write_sale_batch(db, payloads)
+        if results is not None:
+            return results
+        if len(payloads) == 1:
+            return [HTTPException(status_code=409, detail="Insufficient stock")]
+    except SQLAlchemyError:
+        db.rollback()
+        if len(payloads) == 1:
+            return [HTTPException(status_code=500, detail="Could not record sale")]
+    finally:
+        db.close()
+
+    # Stock taken by another worker since the read, or a database error:
+    # write the items one by one so only the failing ones fail
+    return [result for payload in payloads for result in record_sale_batch([payload])]
+
+sale_batches = GroupCommitQueue(
+    record_sale_batch,
+    max_items=settings.SALES_GROUP_COMMIT_MAX_ITEMS,
+    max_wait=settings.SALES_GROUP_COMMIT_MAX_WAIT_MS / 1000
+)
+
+async def record_sale_grouped(payload: schemas.SaleCreate):
+    return await sale_batches.submit(payload)
+
+router.post("/", response_model=schemas.Sale)(
+    record_sale_grouped if settings.SALES_GROUP_COMMIT else record_sale
+)
+
 # ---------- Get Sales (with filters) ----------
-@router.get("/", response_model=list[schemas.Sale])
+@router.get("/", response_model=schemas.Page[schemas.Sale], dependencies=[Depends(query_budget(1))])
 def get_sales(
     start_date: datetime = Query(default=None),
     end_date: datetime = Query(default=None),
     product_name: str = Query(default=None),
     category_name: str = Query(default=None),
-    db: Session = Depends(get_db)
+    sort_order: str = Query(default="desc", description="Sort by date: asc or desc"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(default=None),
+    fields: str = Query(default=None, description="Comma-separated fields to return, e.g. product_id,quantity,date,product.name"),
+    expand: str = Query(default=None, description="Comma-separated relations to include: product, product.category"),
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Sale).join(models.Product)
+    fieldset = parse_fieldset(models.Sale, schemas.Sale, fields, expand)
 
+    filters = sales_between(start_date, end_date)
     if product_name:
-        query = query.filter(models.Product.name.ilike(f"%{product_name}%"))
+        filters.append(product_name_filter(db, product_name, models.Sale.product_id))
     if category_name:
-        query = query.join(models.Category).filter(models.Category.name.ilike(f"%{category_name}%"))
-    if start_date:
-        query = query.filter(models.Sale.date >= start_date)
-    if end_date:
-        query = query.filter(models.Sale.date <= end_date)
+        filters.append(category_name_filter(db, category_name))
+
+    # Loading plan: Sale.product -> Product.category from the same joins,
+    # made only when the response or a filter reads them
+    tables = tables_read(filters)
+    join_categories = relation_requested(fieldset, "product.category") or "categories" in tables
+    query = db.query(models.Sale)
+    if join_categories or relation_requested(fieldset, "product") or "products" in tables:
+        query = query.join(models.Sale.product)
+    if join_categories:
+        query = query.outerjoin(models.Product.category)
+    query = query.filter(*filters).options(*load_options(models.Sale, fieldset, {
+        "product": contains_eager,
+        "product.category": contains_eager
+    }))
+
+    descending = sort_order == "desc"
+    return json_response(schemas.Page[schemas.Sale], paginate(
+        query,
+        sort_key=f"date:{'desc' if descending else 'asc'}",
+        sort_column=models.Sale.date,
+        id_column=models.Sale.id,
+        descending=descending,
+        limit=limit,
+        cursor=cursor
+    ), fieldset)
+
+# ---------- Export Sales (CSV / NDJSON / Parquet) ----------
+SALE_EXPORT_COLUMNS = [
+    ("id", "int"), ("date", "datetime"), ("order_id", "int"), ("product_id", "int"),
+    ("product_name", "str"), ("category_name", "str"), ("quantity", "int"), ("unit_price", "decimal"),
+]
+
+SALE_EXPORT_EXPRESSIONS = {
+    "id": models.Sale.id, "date": models.Sale.date, "order_id": models.Sale.order_id,
+    "product_id": models.Sale.product_id, "product_name": models.Product.name, "category_name": models.Category.name,
+    "quantity": models.Sale.quantity, "unit_price": models.Sale.unit_price,
+}
+
+@router.get("/export")
+def export_sales(
+    format: str = Query(default="csv", pattern="^(csv|ndjson|parquet)$"),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    product_name: str = Query(default=None),
+    category_name: str = Query(default=None),
+    after_id: int = Query(default=None, description="Resume after the last sale id received"),
+    fields: str = Query(default=None, description="Comma-separated columns to export, e.g. id,date,product_id,quantity")
+):
+    # Rows are streamed in id order, so an interrupted export can resume
+    # from its last id
+    columns = SALE_EXPORT_COLUMNS
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in SALE_EXPORT_EXPRESSIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{unknown[0]}'")
+        columns = [column for column in SALE_EXPORT_COLUMNS if column[0] in names]
 
-    return query.all()
+    def build_statement(db: Session):
+        filters = sales_between(start_date, end_date)
+        if product_name:
+            filters.append(product_name_filter(db, product_name, models.Sale.product_id))
+        if category_name:
+            filters.append(category_name_filter(db, category_name))
+        if after_id is not None:
+            filters.append(models.Sale.id > after_id)
+
+        # Products and categories are joined only for a column or filter that reads them
+        expressions = [SALE_EXPORT_EXPRESSIONS[name] for name, _ in columns]
+        tables = tables_read(expressions + filters)
+        statement = select(*expressions).select_from(models.Sale)
+        if "products" in tables or "categories" in tables:
+            statement = statement.join(models.Sale.product)
+        if "categories" in tables:
+            statement = statement.outerjoin(models.Product.category)
+        return statement.where(*filters).order_by(models.Sale.id)
+
+    return export_response(build_statement, columns, format, "sales")
 
 # ---------- Revenue Summary ----------
-@router.get("/revenue-summary")
+@router.get("/revenue-summary", dependencies=[Depends(cached("sales"))])
 def revenue_summary(
     range_type: str = Query(default="daily", description="daily, weekly, monthly, yearly"),
-    db: Session = Depends(get_db)
+    start_date: date = Query(default=None, description="First day to include"),
+    end_date: date = Query(default=None, description="Last day to include"),
+    db: Session = Depends(get_read_db)
 ):
-    # Determine time field
-    if range_type == "daily":
-        label = func.date(models.Sale.date)
-    elif range_type == "weekly":
-        label = func.concat(
-            func.year(models.Sale.date), "-W", func.week(models.Sale.date)
-        )
-    elif range_type == "monthly":
-        label = func.concat(
-            func.year(models.Sale.date), "-", func.month(models.Sale.date)
-        )
-    elif range_type == "yearly":
-        label = func.year(models.Sale.date)
-    else:
+    if range_type not in ("daily", "weekly", "monthly", "yearly"):
         raise HTTPException(status_code=400, detail="Invalid range_type")
 
-    results = db.query(
-        label.label("period"),
-        func.sum(models.Sale.quantity * models.Sale.unit_price).label("revenue")
-    ).group_by(label).order_by(label).all()
+    # Plain range predicates on the rollup key so the (day, ...) index is used
+    query = db.query(models.SalesDailyProduct.day, func.sum(models.SalesDailyProduct.revenue))
+    if start_date:
+        query = query.filter(models.SalesDailyProduct.day >= start_date)
+    if end_date:
+        query = query.filter(models.SalesDailyProduct.day <= end_date)
+    daily = query.group_by(models.SalesDailyProduct.day).order_by(models.SalesDailyProduct.day).all()
+
+    # Weekly, monthly and yearly buckets are derived from the daily rollup
+    buckets = {}
+    for day, revenue in daily:
+        label = period_label(day, range_type)
+        buckets[label] = buckets.get(label, 0) + revenue
 
-    return results
+    return [{"period": label, "revenue": revenue} for label, revenue in buckets.items()]
 
 # ---------- Compare Revenue ----------
-@router.get("/compare")
+@router.get("/compare", dependencies=[Depends(cached("sales", "products", "categories"))])
 def compare_revenue(
     group_by: str = Query(default="category", description="category or product"),
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(
-        func.sum(models.Sale.quantity * models.Sale.unit_price).label("revenue")
-    )
-
+    # Sales count towards their product's current category for every day of
+    # the range. Raw sales carry no category, so whole days read the
+    # per-product rollup too rather than the per-category one, which keeps
+    # the category each sale was made in.
     if group_by == "category":
-        query = query.add_columns(models.Category.name.label("category")) \
-            .join(models.Product).join(models.Category) \
-            .filter(models.Sale.date.between(start_date, end_date)) \
-            .group_by(models.Category.name)
+        name_column = models.Category.name
     elif group_by == "product":
-        query = query.add_columns(models.Product.name.label("product")) \
-            .join(models.Product) \
-            .filter(models.Sale.date.between(start_date, end_date)) \
-            .group_by(models.Product.name)
+        name_column = models.Product.name
     else:
         raise HTTPException(status_code=400, detail="Invalid group_by")
 
-    return query.all()
\ No newline at end of file
+    rollup_day = models.SalesDailyProduct.day
+    rollup = db.query(name_column, func.sum(models.SalesDailyProduct.revenue)) \
+        .select_from(models.SalesDailyProduct) \
+        .join(models.Product, models.Product.id == models.SalesDailyProduct.product_id)
+    raw = db.query(name_column, func.sum(models.Sale.quantity * models.Sale.unit_price)) \
+        .select_from(models.Sale).join(models.Sale.product)
+    if group_by == "category":
+        rollup = rollup.join(models.Product.category)
+        raw = raw.join(models.Product.category)
+
+    # Whole days come from the daily rollup; partial days at either end of the
+    # range are summed from raw sales
+    first_day, last_day = full_days(start_date, end_date)
+    if first_day <= last_day:
+        parts = [
+            rollup.filter(rollup_day.between(first_day, last_day)),
+            raw.filter(*sales_between(start_date, datetime.combine(first_day, time.min), end_exclusive=True)),
+            raw.filter(*sales_between(datetime.combine(last_day + timedelta(days=1), time.min), end_date)),
+        ]
+    else:
+        parts = [raw.filter(*sales_between(start_date, end_date))]
+
+    totals = {}
+    for part in parts:
+        for name, revenue in part.group_by(name_column).all():
+            totals[name] = totals.get(name, 0) + revenue
+
+    return [{"revenue": revenue, group_by: name} for name, revenue in totals.items()]
+
+# ---------- Sales Analytics ----------
+# Computed with NumPy over the in-process columnar snapshot of the sales
+# table (app/analytics.py) instead of SQL over raw sales. Money is summed in
+# cents and returned in currency units; dates filter on the sale's day.
+
+def _product_names(db: Session, product_ids) -> dict:
+    if not len(product_ids):
+        return {}
+    return dict(db.query(models.Product.id, models.Product.name)
+                .filter(models.Product.id.in_([int(product_id) for product_id in product_ids])).all())
+
+def _category_products(db: Session, category_id):
+    # The category's products as they are now, so a product moved to another
+    # category counts towards its new one for all of its sales
+    if category_id is None:
+        return None
+    return [product_id for product_id, in db.query(models.Product.id).filter(models.Product.category_id == category_id)]
+
+async def fresh_sales_snapshot():
+    # Brought up to date on a worker thread with its own connection, so a
+    # request waiting for another's load never holds up the event loop
+    def refresh():
+        connection = read_replicas.connect()
+        db = SessionLocal(bind=connection)
+        try:
+            sales_snapshot.refresh(db)
+        finally:
+            db.close()
+            connection.close()
+
+    await run_in_threadpool(refresh)
+
+def _analytics_sales(db: Session, start_date, end_date, product_id=None, category_id=None) -> dict:
+    return select_sales(sales_snapshot.columns(), start_date, end_date, product_id,
+                        _category_products(db, category_id))
+
+@router.get("/analytics/top-products",
+            dependencies=[Depends(cached("sales", "products")), Depends(fresh_sales_snapshot)])
+def top_products_analytics(
+    start_date: date = Query(default=None, description="First day to include"),
+    end_date: date = Query(default=None, description="Last day to include"),
+    category_id: int = Query(default=None),
+    metric: str = Query(default="revenue", pattern="^(revenue|quantity)$"),
+    limit: int = Query(default=10, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    top = top_products(_analytics_sales(db, start_date, end_date, category_id=category_id), metric, limit)
+    names = _product_names(db, [product_id for product_id, _, _ in top])
+    return [
+        {"product_id": product_id, "product_name": names.get(product_id), "quantity": quantity, "revenue": revenue / 100}
+        for product_id, quantity, revenue in top
+    ]
+
+@router.get("/analytics/moving-average",
+            dependencies=[Depends(cached("sales", "products")), Depends(fresh_sales_snapshot)])
+def moving_average_analytics(
+    start_date: date = Query(default=None, description="First day to report (default: 90 days before end_date)"),
+    end_date: date = Query(default=None, description="Last day to report (default: the latest sale)"),
+    window: list[int] = Query(default=[7, 30], description="Trailing window lengths in days"),
+    product_id: int = Query(default=None),
+    category_id: int = Query(default=None),
+    db: Session = Depends(get_read_db)
+):
+    if any(days < 1 or days > 365 for days in window):
+        raise HTTPException(status_code=400, detail="Windows must be between 1 and 365 days")
+    columns = sales_snapshot.columns()
+    if end_date is None:
+        if not len(columns["day"]):
+            return []
+        end_date = from_day_number(columns["day"].max())
+    start_date = start_date or end_date - timedelta(days=89)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+
+    # Read enough days before start_date to fill the first day's windows
+    lead_days = max(window) - 1
+    first_day = start_date - timedelta(days=lead_days)
+    sales = select_sales(columns, first_day, end_date, product_id, _category_products(db, category_id))
+    daily = daily_revenue(sales, first_day, end_date)
+    averages = moving_averages(daily, window, lead_days)
+    return [
+        {
+            "day": start_date + timedelta(days=offset),
+            "revenue": round(float(daily[lead_days + offset]) / 100, 2),
+            "moving_average": {str(days): round(averages[days][offset] / 100, 2) for days in window},
+        }
+        for offset in range((end_date - start_date).days + 1)
+    ]
+
+@router.get("/analytics/abc",
+            dependencies=[Depends(cached("sales", "products")), Depends(fresh_sales_snapshot)])
+def abc_analytics(
+    start_date: date = Query(default=None, description="First day to include"),
+    end_date: date = Query(default=None, description="Last day to include"),
+    a_share: float = Query(default=0.8, gt=0, lt=1, description="Share of revenue covered by class A"),
+    b_share: float = Query(default=0.95, gt=0, lt=1, description="Share of revenue covered by classes A and B"),
+    limit: int = Query(default=100, ge=0, le=10000, description="Products to list, by revenue"),
+    db: Session = Depends(get_read_db)
+):
+    if a_share > b_share:
+        raise HTTPException(status_code=400, detail="a_share must not exceed b_share")
+    product_ids, revenue, cumulative, classes = abc_classes(_analytics_sales(db, start_date, end_date), a_share, b_share)
+    total = int(revenue.sum())
+
+    summary = {}
+    for label in ("A", "B", "C"):
+        in_class = classes == label
+        class_revenue = int(revenue[in_class].sum())
+        summary[label] = {
+            "products": int(in_class.sum()),
+            "revenue": class_revenue / 100,
+            "share": round(class_revenue / total, 4) if total else 0.0,
+        }
+
+    names = _product_names(db, product_ids[:limit])
+    return {
+        "total_revenue": total / 100,
+        "classes": summary,
+        "products": [
+            {
+                "product_id": int(product_id),
+                "product_name": names.get(int(product_id)),
+                "revenue": int(product_revenue) / 100,
+                "cumulative_share": round(float(share), 4),
+                "class": str(label),
+            }
+            for product_id, product_revenue, share, label in
+            zip(product_ids[:limit], revenue[:limit], cumulative[:limit], classes[:limit])
+        ],
+    }
+
+@router.get("/analytics/sell-through",
+            dependencies=[Depends(cached("sales", "inventory", "products")), Depends(fresh_sales_snapshot)])
+def sell_through_analytics(
+    start_date: date = Query(default=None, description="First day to include"),
+    end_date: date = Query(default=None, description="Last day to include"),
+    sort_order: str = Query(default="desc", pattern="^(asc|desc)$", description="By sell-through rate"),
+    limit: int = Query(default=50, ge=1, le=10000),
+    db: Session = Depends(get_read_db)
+):
+    # Units sold in the period / (units sold + units on hand now), for every
+    # product with an inventory record
+    product_ids, sold, on_hand, rates = sell_through(
+        _analytics_sales(db, start_date, end_date), stock_index.quantities(db), sort_order == "desc"
+    )
+    names = _product_names(db, product_ids[:limit])
+    return [
+        {
+            "product_id": int(product_id),
+            "product_name": names.get(int(product_id)),
+            "units_sold": int(units_sold),
+            "on_hand": int(quantity),
+            "sell_through": round(float(rate), 4),
+        }
+        for product_id, units_sold, quantity, rate in
+        zip(product_ids[:limit], sold[:limit], on_hand[:limit], rates[:limit])
+    ]
@@ -1,6 +1,14 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Generic, Optional, List, TypeVar
+
+T = TypeVar("T")
+
+# ---------- Pagination ----------
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
 
 # ---------- Category ----------
 
@@ -39,6 +47,20 @@ class Product(ProductBase):
         "from_attributes": True
     }
 
+class ProductBatch(BaseModel):
+    items: List[Product]
+    missing: List[int] = []
+
+# Row of POST /products/import, matched on SKU; the category is given by
+# name or id
+class ProductImportRow(BaseModel):
+    sku: str
+    name: str
+    price: float
+    description: Optional[str] = None
+    category_name: Optional[str] = None
+    category_id: Optional[int] = None
+
 # ---------- Inventory ----------
 
 class InventoryBase(BaseModel):
@@ -57,6 +79,12 @@ class Inventory(InventoryBase):
         "from_attributes": True
     }
 
+# Row of POST /inventory/import; the product is given by SKU or id
+class InventoryImportRow(BaseModel):
+    sku: Optional[str] = None
+    product_id: Optional[int] = None
+    quantity: int
+
 # ---------- Sale ----------
 
 class SaleBase(BaseModel):
@@ -85,8 +113,14 @@ class OrderBase(BaseModel):
     customer_email: Optional[EmailStr] = None
     total_amount: float
 
-class OrderCreate(OrderBase):
-    pass
+class OrderItemCreate(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+class OrderCreate(BaseModel):
+    customer_name: Optional[str] = None
+    customer_email: Optional[EmailStr] = None
+    sales: List[OrderItemCreate] = Field(min_length=1)
 
 class Order(OrderBase):
     id: int
@@ -0,0 +1,214 @@
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, read_replicas
+from app.instrumentation import logger, statements_not_counted
+from app.models import models
+
+NGRAM = 3
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+# ---------- N-gram index ----------
+
+class NgramIndex:
+    # Inverted index from trigram to ids, for substring search. Posting lists
+    # are append-only int arrays; matches are verified against the current
+    # text, so a renamed entry's stale postings never produce a false hit.
+    # Renames this process does not see are picked up by the next rebuild.
+
+    def __init__(self):
+        self._postings = defaultdict(lambda: array("i"))
+        self._text = {}
+
+    def __len__(self):
+        return len(self._text)
+
+    def add(self, key: int, text: str):
+        text = (text or "").lower()
+        if self._text.get(key) == text:
+            return
+        self._text[key] = text
+        for gram in _ngrams(text):
+            self._postings[gram].append(key)
+
+    def search(self, term: str):
+        # Ids whose text contains `term`, or None if the term is too short to
+        # be answered from the index
+        term = term.lower()
+        grams = _ngrams(term)
+        if not grams:
+            return None
+
+        postings = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        if len(postings) > 1 and len(candidates) > 1000:
+            candidates.intersection_update(postings[1])
+        return {key for key in candidates if term in self._text.get(key, "")}
+
+    def score(self, key: int, term: str) -> float:
+        # Trigram similarity (shared / union), with exact and prefix matches first
+        text, term = self._text.get(key, ""), term.lower()
+        if text == term:
+            return 3.0
+        text_grams, term_grams = _ngrams(text), _ngrams(term)
+        shared = len(text_grams & term_grams)
+        similarity = shared / (len(text_grams | term_grams) or 1)
+        return similarity + (1.0 if text.startswith(term) else 0.0)
+
+
+# ---------- Catalog search ----------
+
+class CatalogSearch:
+    # Product name, SKU and category name indexes, loaded from the database on
+    # first use and kept in sync by the write endpoints in this process. Every
+    # SEARCH_INDEX_TTL_SECONDS they are rebuilt from a full read in a
+    # background thread, picking up products other workers created or
+    # renamed, while requests keep using the current ones. Requests that need
+    # the indexes while the first load is still running fall back to ILIKE
+    # instead of waiting for it. The lock is only held to read or swap the
+    # indexes, never across a database read, so in async mode no request
+    # blocks the event loop waiting on another's I/O.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = NgramIndex()
+        self._skus = NgramIndex()
+        self._categories = NgramIndex()
+        self._loaded_at = None
+        self._loading = False
+        # Products added while a load runs, replayed into the loaded indexes
+        self._pending = []
+
+    def _load(self, db: Session) -> tuple:
+        names, skus, categories = NgramIndex(), NgramIndex(), NgramIndex()
+        with statements_not_counted():
+            rows = db.query(models.Product.id, models.Product.name, models.Product.sku) \
+                .execution_options(yield_per=10000)
+            for product_id, name, sku in rows:
+                names.add(product_id, name)
+                skus.add(product_id, sku)
+            for category_id, name in db.query(models.Category.id, models.Category.name):
+                categories.add(category_id, name)
+        return names, skus, categories
+
+    def _start_loading(self) -> bool:
+        # Under the lock; False if a load is already running
+        if self._loading:
+            return False
+        self._loading = True
+        self._pending = []
+        return True
+
+    def _run_load(self, db: Session):
+        indexes = None
+        try:
+            indexes = self._load(db)
+        finally:
+            with self._lock:
+                self._loading = False
+                if indexes is not None:
+                    self._names, self._skus, self._categories = indexes
+                    for product_id, name, sku in self._pending:
+                        self._names.add(product_id, name)
+                        self._skus.add(product_id, sku)
+                    self._loaded_at = time.monotonic()
+                self._pending = []
+
+    def _rebuild_in_background(self):
+        connection = read_replicas.connect()
+        db = SessionLocal(bind=connection)
+        try:
+            self._run_load(db)
+        except Exception:
+            logger.exception("Search index rebuild failed")
+        finally:
+            db.close()
+            connection.close()
+
+    def refresh(self, db: Session):
+        # Loads the indexes now, unless they are fresh or already loading
+        with self._lock:
+            if self._loaded_at and time.monotonic() - self._loaded_at < settings.SEARCH_INDEX_TTL_SECONDS:
+                return
+            if not self._start_loading():
+                return
+        self._run_load(db)
+
+    def _ready(self, db: Session) -> bool:
+        # Whether the indexes can answer now: loads them on first use, and
+        # starts a background rebuild once they are stale
+        with self._lock:
+            if self._loaded_at is not None:
+                if time.monotonic() - self._loaded_at >= settings.SEARCH_INDEX_TTL_SECONDS and self._start_loading():
+                    threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+                return True
+            if not self._start_loading():
+                return False
+        self._run_load(db)
+        return True
+
+    def add_product(self, product_id: int, name: str, sku: str = None):
+        with self._lock:
+            self._names.add(product_id, name)
+            self._skus.add(product_id, sku)
+            if self._loading:
+                self._pending.append((product_id, name, sku))
+
+    def _match(self, db: Session, index: str, term: str):
+        if not self._ready(db):
+            return None
+        with self._lock:
+            ids = getattr(self, index).search(term)
+        if ids is None or len(ids) > settings.SEARCH_MAX_CANDIDATES:
+            return None
+        return ids
+
+    def match_products(self, db: Session, term: str):
+        return self._match(db, "_names", term)
+
+    def match_skus(self, db: Session, term: str):
+        return self._match(db, "_skus", term)
+
+    def match_categories(self, db: Session, term: str):
+        return self._match(db, "_categories", term)
+
+    def rank_products(self, term: str, product_ids) -> list:
+        with self._lock:
+            scores = {product_id: self._names.score(product_id, term) for product_id in product_ids}
+        return sorted(scores, key=lambda product_id: (-scores[product_id], product_id))
+
+
+catalog_search = CatalogSearch()
+
+
+# ---------- Filter predicates ----------
+# `id IN (...)` predicates resolved from the index. Terms shorter than a
+# trigram, or too unselective to be worth an IN list, fall back to ILIKE
+# (callers join products and categories).
+
+def product_name_filter(db: Session, term: str, product_id_column=models.Product.id):
+    ids = catalog_search.match_products(db, term)
+    if ids is None:
+        return models.Product.name.ilike(f"%{term}%")
+    return product_id_column.in_(list(ids))
+
+def sku_filter(db: Session, term: str, product_id_column=models.Product.id):
+    ids = catalog_search.match_skus(db, term)
+    if ids is None:
+        return models.Product.sku.ilike(f"%{term}%")
+    return product_id_column.in_(list(ids))
+
+def category_name_filter(db: Session, term: str):
+    ids = catalog_search.match_categories(db, term)
+    if ids is None:
+        return models.Category.name.ilike(f"%{term}%")
+    return models.Product.category_id.in_(list(ids))
@@ -0,0 +1,90 @@
+import time
+import types
+import typing
+from decimal import Decimal
+from functools import lru_cache
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.instrumentation import current_request_stats
+
+
+# ---------- Row projection ----------
+# List endpoints serialize straight from the ORM rows to JSON, skipping
+# per-row `from_attributes` validation into the response schema. The
+# projection for each schema is built once: a list of (field, getter)
+# pairs, recursing into nested schemas. Rows come from our own database,
+# so the output matches the response_model without re-validating it.
+
+def _unwrap_optional(annotation):
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _converter(annotation):
+    annotation = _unwrap_optional(annotation)
+    if typing.get_origin(annotation) in (list, typing.List):
+        item = _converter(typing.get_args(annotation)[0])
+        if item is None:
+            return list
+        return lambda values: [item(value) for value in values]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return projector(annotation)
+    return None
+
+
+@lru_cache(maxsize=None)
+def projector(model: type):
+    fields = [(name, _converter(field.annotation)) for name, field in model.model_fields.items()]
+
+    def project(obj):
+        if obj is None:
+            return None
+        # Loaded ORM attributes live in the instance __dict__; anything else
+        # (properties, unloaded relationships) goes through getattr
+        loaded = obj if isinstance(obj, dict) else obj.__dict__
+        result = {}
+        for name, convert in fields:
+            value = loaded[name] if name in loaded else getattr(obj, name)
+            result[name] = value if convert is None or value is None else convert(value)
+        return result
+
+    return project
+
+
+# ---------- JSON responses ----------
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+def dump_json(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def json_response(model, content, fieldset=None) -> Response:
+    # `model` is the route's response_model: a schema, list[schema] or
+    # Page[schema]. A sparse fieldset (app.fieldsets) replaces the schema
+    # projection of each row.
+    started = time.perf_counter()
+    if typing.get_origin(model) is list:
+        convert = projector(typing.get_args(model)[0]) if fieldset is None else fieldset.project
+        data = [convert(item) for item in content]
+    elif fieldset is None:
+        data = projector(model)(content)
+    elif "items" in model.model_fields:
+        data = {**content, "items": [fieldset.project(item) for item in content["items"]]}
+    else:
+        data = fieldset.project(content)
+    body = dump_json(data)
+    stats = current_request_stats()
+    if stats is not None:
+        stats.serialize_seconds += time.perf_counter() - started
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,66 @@
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+
+from app.catalog import catalog
+from app.config import settings
+from app.models import models
+
+
+# ---------- Stock levels ----------
+# Stock is only ever changed with a single UPDATE that computes the new
+# quantity in the database (quantity = quantity - n), never by writing back
+# a value read earlier, so concurrent sales of the same product cannot
+# overwrite each other.
+
+class StockLevel:
+    __slots__ = ("id", "price", "category_id", "quantity")
+
+    def __init__(self, product, quantity):
+        self.id = product.id
+        self.price = product.price
+        self.category_id = product.category_id
+        self.quantity = quantity
+
+def load_stock(db: Session, product_ids) -> dict:
+    # Prices and stock levels for every product that exists, in one round
+    # trip; quantity is None for products that have no inventory row (stock
+    # is not tracked). Stock is always read, while prices and categories come
+    # from the catalog cache once every product is in it.
+    product_ids = set(product_ids)
+    products = catalog.cached_products(product_ids)
+    if len(products) < len(product_ids):
+        generation = catalog.generation
+        rows = db.query(models.Product.id, models.Product.sku, models.Product.price, models.Product.category_id,
+                        models.Inventory.quantity) \
+            .outerjoin(models.Inventory, models.Inventory.product_id == models.Product.id) \
+            .filter(models.Product.id.in_(product_ids)) \
+            .all()
+        catalog.add_products(rows, generation)
+        return {row.id: StockLevel(row, row.quantity) for row in rows}
+
+    quantities = dict(
+        db.query(models.Inventory.product_id, models.Inventory.quantity)
+        .filter(models.Inventory.product_id.in_(product_ids))
+        .all()
+    )
+    return {product_id: StockLevel(product, quantities.get(product_id)) for product_id, product in products.items()}
+
+def oversell_allowed() -> bool:
+    return settings.OVERSELL_POLICY == "allow"
+
+def decrement_stock(db: Session, quantities: dict) -> bool:
+    # One UPDATE for all products:
+    #   SET quantity = quantity - CASE product_id ... [WHERE quantity >= CASE product_id ...]
+    # With OVERSELL_POLICY=reject the WHERE re-checks stock atomically, and
+    # False means some row lacked it; the caller must roll back.
+    if not quantities:
+        return True
+
+    inventory = models.Inventory.__table__
+    delta = case(quantities, value=inventory.c.product_id)
+    statement = update(inventory) \
+        .where(inventory.c.product_id.in_(list(quantities))) \
+        .values(quantity=inventory.c.quantity - delta)
+    if not oversell_allowed():
+        statement = statement.where(inventory.c.quantity >= delta)
+    return db.execute(statement).rowcount == len(quantities)
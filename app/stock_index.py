@@ -0,0 +1,113 @@
+import asyncio
+import bisect
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.instrumentation import statements_not_counted
+from app.models import models
+
+
+# ---------- Stock level index ----------
+
+class StockIndex:
+    # Quantity of every tracked product, kept as a dict and as a sorted list
+    # of (quantity, product_id) so "quantity <= threshold" is a bisect. Loaded
+    # from the database on first use and kept current by the write endpoints
+    # in this process; a reload every LOW_STOCK_INDEX_TTL_SECONDS picks up
+    # changes made by other workers.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quantities = {}
+        self._sorted = []
+        self._loaded_at = None
+        self._subscribers = []
+
+    def refresh(self, db: Session, force: bool = False):
+        with self._lock:
+            if not force and self._loaded_at and time.monotonic() - self._loaded_at < settings.LOW_STOCK_INDEX_TTL_SECONDS:
+                return
+        with statements_not_counted():
+            rows = db.query(models.Inventory.product_id, models.Inventory.quantity).all()
+        with self._lock:
+            loaded = dict(rows)
+            if self._loaded_at is not None:
+                for product_id in self._quantities.keys() | loaded.keys():
+                    self._notify(product_id, self._quantities.get(product_id), loaded.get(product_id))
+            self._quantities = loaded
+            self._sorted = sorted((quantity, product_id) for product_id, quantity in loaded.items())
+            self._loaded_at = time.monotonic()
+
+    def _set(self, product_id: int, quantity: int):
+        previous = self._quantities.get(product_id)
+        if previous == quantity:
+            return
+        if previous is not None:
+            del self._sorted[bisect.bisect_left(self._sorted, (previous, product_id))]
+        bisect.insort(self._sorted, (quantity, product_id))
+        self._quantities[product_id] = quantity
+        self._notify(product_id, previous, quantity)
+
+    # Called after commit by the write paths. Until the index is loaded
+    # there is nothing to update: the load reads the committed values.
+
+    def set_quantities(self, quantities: dict):
+        with self._lock:
+            if self._loaded_at is not None:
+                for product_id, quantity in quantities.items():
+                    self._set(product_id, quantity)
+
+    def apply_deltas(self, deltas: dict):
+        with self._lock:
+            if self._loaded_at is not None:
+                for product_id, delta in deltas.items():
+                    if product_id in self._quantities:
+                        self._set(product_id, self._quantities[product_id] + delta)
+
+    def quantities(self, db: Session) -> dict:
+        self.refresh(db)
+        with self._lock:
+            return dict(self._quantities)
+
+    def low_stock(self, db: Session, threshold: int) -> list:
+        self.refresh(db)
+        with self._lock:
+            end = bisect.bisect_right(self._sorted, (threshold, float("inf")))
+            return [product_id for _, product_id in self._sorted[:end]]
+
+    # ---------- Threshold subscriptions ----------
+    # Each subscriber gets an event whenever a product's quantity crosses its
+    # threshold: "low_stock" going down to or below it, "restocked" going back
+    # above it. Events are handed to the subscriber's event loop, since
+    # updates arrive from threadpool workers.
+
+    def subscribe(self, threshold: int) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((threshold, queue, asyncio.get_running_loop()))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber[1] is not queue]
+
+    def _notify(self, product_id: int, previous, quantity):
+        for threshold, queue, loop in self._subscribers:
+            was_low = previous is not None and previous <= threshold
+            is_low = quantity is not None and quantity <= threshold
+            if was_low == is_low:
+                continue
+            event = {
+                "event": "low_stock" if is_low else "restocked",
+                "product_id": product_id,
+                "quantity": quantity,
+                "previous_quantity": previous,
+                "threshold": threshold,
+            }
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+
+stock_index = StockIndex()
@@ -0,0 +1,114 @@
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+SEED_CHUNK_ROWS = 5000
+SEED_STOCK = 1_000_000
+
+
+# ---------- Benchmark data ----------
+# Seeds a database with `products` products across `categories` categories,
+# each with SEED_STOCK units in stock (so write benchmarks never run out),
+# `orders` orders of 1-3 sales, and standalone sales up to `sales` in total,
+# spread over the last `days` days. Rows go in with bulk Core inserts and
+# the revenue rollups are rebuilt at the end. Returns the ids and names the
+# benchmarks draw request parameters from.
+
+def _insert_chunks(connection, table, rows: list):
+    for start in range(0, len(rows), SEED_CHUNK_ROWS):
+        connection.execute(insert(table), rows[start:start + SEED_CHUNK_ROWS])
+
+
+def seed_database(database_url: str, products: int, orders: int, sales: int,
+                  categories: int = 20, days: int = 365, seed: int = 1) -> dict:
+    os.environ["DATABASE_URL"] = database_url
+    from app import migrate
+    from app.database import SessionLocal, engine
+    from app.models import models
+    from app.rollups import rebuild
+
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    now = datetime.utcnow().replace(microsecond=0)
+    migrate.upgrade(engine)
+
+    with engine.begin() as connection:
+        category_names = [f"Category {run} {i}" for i in range(categories)]
+        _insert_chunks(connection, models.Category.__table__, [{"name": name} for name in category_names])
+        category_ids = [row.id for row in connection.execute(
+            models.Category.__table__.select().where(models.Category.name.in_(category_names))
+        )]
+
+        product_rows = [
+            {
+                "name": f"Product {run} {i}",
+                "sku": f"BENCH-{run}-{i}",
+                "price": Decimal(rng.randint(100, 50000)) / 100,
+                "description": f"Benchmark product {i}",
+                "category_id": rng.choice(category_ids),
+                "created_at": now - timedelta(days=rng.randrange(days)),
+                "updated_at": now,
+            }
+            for i in range(products)
+        ]
+        _insert_chunks(connection, models.Product.__table__, product_rows)
+        prices = {
+            row.id: row.price for row in connection.execute(
+                models.Product.__table__.select().where(models.Product.sku.like(f"BENCH-{run}-%"))
+            )
+        }
+        product_ids = sorted(prices)
+        _insert_chunks(connection, models.Inventory.__table__, [
+            {"product_id": product_id, "quantity": SEED_STOCK, "last_updated": now} for product_id in product_ids
+        ])
+
+        order_rows, order_lines = [], []
+        for i in range(orders):
+            created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+            lines = [(product_id, rng.randint(1, 5)) for product_id in rng.sample(product_ids, min(rng.randint(1, 3), len(product_ids)))]
+            order_rows.append({
+                "customer_name": f"Customer {i}",
+                "customer_email": f"customer{i}.{run}@example.com",
+                "total_amount": sum(prices[product_id] * quantity for product_id, quantity in lines),
+                "created_at": created_at,
+            })
+            order_lines.append((created_at, lines))
+        _insert_chunks(connection, models.Order.__table__, order_rows)
+        order_ids = [row.id for row in connection.execute(
+            models.Order.__table__.select().where(models.Order.customer_email.like(f"%.{run}@example.com"))
+            .order_by(models.Order.id)
+        )]
+
+        sale_rows = [
+            {"order_id": order_id, "product_id": product_id, "quantity": quantity,
+             "unit_price": prices[product_id], "date": created_at}
+            for order_id, (created_at, lines) in zip(order_ids, order_lines)
+            for product_id, quantity in lines
+        ]
+        while len(sale_rows) < sales:
+            product_id = rng.choice(product_ids)
+            sale_rows.append({
+                "order_id": None, "product_id": product_id, "quantity": rng.randint(1, 5),
+                "unit_price": prices[product_id], "date": now - timedelta(seconds=rng.randrange(days * 86400)),
+            })
+        _insert_chunks(connection, models.Sale.__table__, sale_rows)
+
+    db = SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
+
+    return {
+        "run": run,
+        "product_ids": product_ids,
+        "order_ids": order_ids,
+        "category_ids": category_ids,
+        "category_names": category_names,
+        "first_day": (now - timedelta(days=days)).date().isoformat(),
+        "last_day": now.date().isoformat(),
+    }
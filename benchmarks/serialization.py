@@ -0,0 +1,76 @@
+import argparse
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+
+from app.models import models
+from app.schemas import schemas
+from app.serialization import dump_json, projector
+
+
+# ---------- Response serialization microbenchmark ----------
+# Times turning a page of ORM sales (with product and category loaded) into
+# JSON bytes two ways: validating into the response model and dumping it,
+# as FastAPI does for response_model routes, and the projection used by
+# app.serialization.json_response, for a default page (500 rows) and a
+# large page or export batch (10000). No database or server is involved.
+#
+#   python -m benchmarks.serialization --rows 500,10000 --repeat 20
+
+def build_sales(rows: int) -> list:
+    now = datetime(2024, 1, 1, 12, 0)
+    category = models.Category(id=1, name="Electronics")
+    products = [
+        models.Product(id=i, name=f"Product {i}", sku=f"SKU-{i}", price=Decimal("19.99"), description="Benchmark product",
+                       category_id=1, category=category, created_at=now, updated_at=now)
+        for i in range(50)
+    ]
+    return [
+        models.Sale(id=i, product_id=products[i % 50].id, product=products[i % 50], quantity=2,
+                    unit_price=Decimal("19.99"), date=now, order_id=None)
+        for i in range(rows)
+    ]
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(rows: int, repeat: int):
+    sales = build_sales(rows)
+    adapter = TypeAdapter(list[schemas.Sale])
+    project = projector(schemas.Sale)
+
+    def validated():
+        return adapter.dump_json(adapter.validate_python(sales, from_attributes=True))
+
+    def projected():
+        return dump_json([project(sale) for sale in sales])
+
+    assert validated() == projected(), "projection output differs from the response model"
+
+    print(f"{rows} sales with product and category, best of {repeat}")
+    timings = {name: best_of(repeat, function) for name, function in (("response_model", validated), ("projection", projected))}
+    baseline = timings["response_model"]
+    for name, seconds in timings.items():
+        print(f"  {name:<16} {seconds * 1000:>8.2f} ms  {seconds / rows * 1e6:>6.1f} us/row  {baseline / seconds:>5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response model validation vs projection, per row")
+    parser.add_argument("--rows", default="500,10000", help="Comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for rows in args.rows.split(","):
+        run(int(rows), args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -1,112 +1,290 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+
+from app import migrate
 from app.database import SessionLocal, engine
 from app.models import models
-import datetime
+from app.rollups import rebuild
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+# Synthetic data generator: configurable volumes with realistic skew,
+# reproducible for a given --seed and --end-date.
+#
+#   python populate_demo_data.py                      # small demo dataset
+#   python populate_demo_data.py --categories 1000 --products 1000000 --orders 5000000 \
+#       --sales 50000000 --years 3 --workers 8 --seed 42 --end-date 2024-12-31
+#
+# Rows are written with Core bulk inserts, --batch-size rows per transaction.
+# Work is split into batches, each generated from its own RNG seeded by
+# (seed, table, batch number), so the data does not depend on --workers.
+# Categories, products and orders get explicit ids following the existing
+# rows, so batches can reference each other without reading anything back.
 
-# Initialize DB session
-db = SessionLocal()
+ADJECTIVES = ["Classic", "Smart", "Eco", "Ultra", "Compact", "Premium", "Wireless", "Organic", "Vintage", "Pro",
+              "Portable", "Deluxe", "Essential", "Heavy-Duty", "Slim", "Modern"]
+NOUNS = ["Watch", "Earbuds", "Sneakers", "Backpack", "Lamp", "Blender", "Jacket", "Bottle", "Keyboard", "Mug",
+         "Speaker", "Notebook", "Chair", "Vitamin Pack", "Sunglasses", "Charger", "Tent", "Camera", "Scarf", "Kettle"]
+DEPARTMENTS = ["Electronics", "Fashion", "Health", "Home", "Sports", "Toys", "Books", "Garden", "Beauty", "Grocery",
+               "Automotive", "Office", "Pets", "Music", "Jewelry", "Baby"]
+FIRST_NAMES = ["John", "Sara", "Ali", "Maria", "Chen", "Fatima", "Lucas", "Aisha", "Noah", "Emma", "Omar", "Mia"]
+LAST_NAMES = ["Doe", "Smith", "Khan", "Garcia", "Wang", "Ahmed", "Silva", "Brown", "Müller", "Rossi", "Kim", "Ali"]
 
-# ---------- Categories ----------
-categories = {
-    "Electronics": models.Category(name="Electronics"),
-    "Fashion": models.Category(name="Fashion"),
-    "Health": models.Category(name="Health"),
-}
-db.add_all(categories.values())
-db.commit()
-
-# ---------- Products ----------
-products = [
-    models.Product(
-        name="Smart Watch Series 5",
-        category_id=categories["Electronics"].id,
-        price=199.99,
-        description="Fitness tracking, heart rate monitor, GPS",
-        sku="ELEC-001",
-    ),
-    models.Product(
-        name="Bluetooth Earbuds X1",
-        category_id=categories["Electronics"].id,
-        price=89.99,
-        description="Noise cancelling, 20-hour battery life",
-        sku="ELEC-002",
-    ),
-    models.Product(
-        name="Men's Running Sneakers",
-        category_id=categories["Fashion"].id,
-        price=129.50,
-        description="Comfortable athletic shoes with shock absorption",
-        sku="FASH-001",
-    ),
-]
-db.add_all(products)
-db.commit()
-
-# ---------- Inventory ----------
-inventory = [
-    models.Inventory(product_id=1, quantity=150),
-    models.Inventory(product_id=2, quantity=80),
-    models.Inventory(product_id=3, quantity=200),
-]
-db.add_all(inventory)
-db.commit()
-
-# ---------- Orders + Sales ----------
-orders = [
-    {
-        "customer_name": "John Doe",
-        "customer_email": "john@example.com",
-        "items": [
-            {"product_id": 1, "quantity": 1},
-            {"product_id": 2, "quantity": 2}
-        ]
-    },
-    {
-        "customer_name": "Sara Smith",
-        "customer_email": "sara@example.com",
-        "items": [
-            {"product_id": 3, "quantity": 3}
+# Relative sales by hour of day and by weekday (Monday first)
+HOUR_WEIGHTS = [1, 0.5, 0.3, 0.2, 0.2, 0.4, 1, 2, 3, 4, 4.5, 5, 5.5, 5, 4.5, 4.5, 5, 5.5, 6.5, 7.5, 8, 7, 4.5, 2.5]
+WEEKDAY_WEIGHTS = [0.9, 0.9, 0.95, 1.0, 1.15, 1.35, 1.25]
+
+
+# ---------- Plan ----------
+# Everything the batches share, rebuilt identically in every worker process
+# from the arguments and the id offsets.
+
+class Plan:
+    def __init__(self, args, offsets: dict):
+        self.args = args
+        self.offsets = offsets
+        rng = random.Random(f"{args.seed}:plan")
+
+        # Log-normal prices between 1 and 5000, in cents
+        self.prices = [min(500000, max(100, round(math.exp(rng.gauss(3.3, 1.0)) * 100))) for _ in range(args.products)]
+        self.unit_prices = [Decimal(cents) / 100 for cents in self.prices]
+
+        # Zipfian popularity: the product at rank r sells in proportion to
+        # 1 / r^s. Ranks are a shuffle, so popularity is unrelated to id.
+        self.popular = list(range(args.products))
+        rng.shuffle(self.popular)
+        self.popularity = list(_cumulative(1 / (rank + 1) ** args.zipf for rank in range(args.products)))
+        self.category_popularity = list(_cumulative(1 / (rank + 1) ** args.zipf for rank in range(args.categories)))
+
+        # Seasonal days: weekly pattern, a late-November to December peak, a
+        # smaller summer bump and year-on-year growth
+        self.days = [args.end_date - timedelta(days=offset) for offset in range(round(args.years * 365) - 1, -1, -1)]
+        self.day_weights = list(_cumulative(_day_weight(day, i / len(self.days), args.growth) for i, day in enumerate(self.days)))
+        self.hour_weights = list(_cumulative(HOUR_WEIGHTS))
+
+    def product_index(self, rng, count: int) -> list:
+        return [self.popular[rank] for rank in rng.choices(range(len(self.popular)), cum_weights=self.popularity, k=count)]
+
+    def timestamps(self, rng, count: int) -> list:
+        days = rng.choices(self.days, cum_weights=self.day_weights, k=count)
+        hours = rng.choices(range(24), cum_weights=self.hour_weights, k=count)
+        return [
+            datetime(day.year, day.month, day.day, hour, rng.randrange(60), rng.randrange(60))
+            for day, hour in zip(days, hours)
         ]
-    }
-]
-
-for order_data in orders:
-    total = 0
-    sales = []
-    for item in order_data["items"]:
-        product = db.query(models.Product).get(item["product_id"])
-        unit_price = float(product.price)
-        total += item["quantity"] * unit_price
-
-        sale = models.Sale(
-            product_id=item["product_id"],
-            quantity=item["quantity"],
-            unit_price=unit_price,
-            date=datetime.datetime.utcnow()
-        )
-        sales.append(sale)
-
-        # Decrease inventory
-        inventory = db.query(models.Inventory).filter_by(product_id=item["product_id"]).first()
-        if inventory:
-            inventory.quantity -= item["quantity"]
-
-    order = models.Order(
-        customer_name=order_data["customer_name"],
-        customer_email=order_data["customer_email"],
-        total_amount=total,
-        created_at=datetime.datetime.utcnow()
-    )
-    db.add(order)
-    db.flush()  # get order.id
-
-    for s in sales:
-        s.order_id = order.id
-        db.add(s)
-
-db.commit()
-db.close()
-
-print("✅ Demo data successfully populated.")
\ No newline at end of file
+
+
+def _cumulative(weights):
+    total = 0.0
+    for weight in weights:
+        total += weight
+        yield total
+
+
+def _day_weight(day: date, elapsed: float, growth: float) -> float:
+    day_of_year = day.timetuple().tm_yday
+    holidays = 1.8 * math.exp(-((day_of_year - 345) / 18) ** 2)
+    summer = 0.25 * math.exp(-((day_of_year - 200) / 30) ** 2)
+    return WEEKDAY_WEIGHTS[day.weekday()] * (1 + holidays + summer) * (1 + growth) ** (elapsed * 3)
+
+
+# ---------- Batches ----------
+# Each writes rows start..stop-1 of its table in one transaction and returns
+# the number of rows written (for orders, the number of sales).
+
+def _insert(connection, model, rows: list):
+    if rows:
+        connection.execute(insert(model.__table__), rows)
+
+
+def categories_batch(plan: Plan, rng, start: int, stop: int) -> int:
+    # Names are numbered by id, so they stay unique when appending to a
+    # database that already has generated categories
+    ids = range(plan.offsets["categories"] + start, plan.offsets["categories"] + stop)
+    rows = [
+        {"id": category_id, "name": f"{DEPARTMENTS[(category_id - 1) % len(DEPARTMENTS)]} {category_id}"}
+        for category_id in ids
+    ]
+    with engine.begin() as connection:
+        _insert(connection, models.Category, rows)
+    return len(rows)
+
+
+def products_batch(plan: Plan, rng, start: int, stop: int) -> int:
+    args = plan.args
+    categories = rng.choices(range(args.categories), cum_weights=plan.category_popularity, k=stop - start)
+    created = plan.timestamps(rng, stop - start)
+    products, inventory = [], []
+    for i, category, created_at in zip(range(start, stop), categories, created):
+        product_id = plan.offsets["products"] + i
+        products.append({
+            "id": product_id,
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i + 1}",
+            "category_id": plan.offsets["categories"] + category,
+            "price": plan.unit_prices[i],
+            "description": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS).lower()} for everyday use",
+            "sku": f"SKU-{product_id:08d}",
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        # About 5% out of stock, a few more running low
+        quantity = 0 if rng.random() < 0.05 else max(1, int(rng.expovariate(1 / 150)))
+        inventory.append({"product_id": product_id, "quantity": quantity, "last_updated": args.end_datetime})
+    with engine.begin() as connection:
+        _insert(connection, models.Product, products)
+        _insert(connection, models.Inventory, inventory)
+    return len(products)
+
+
+def orders_batch(plan: Plan, rng, start: int, stop: int) -> int:
+    # Orders of 1-4 lines; their sales are written with them. Returns the
+    # number of sales, which counts towards --sales.
+    created = plan.timestamps(rng, stop - start)
+    orders, sales = [], []
+    for i, created_at in zip(range(start, stop), created):
+        order_id = plan.offsets["orders"] + i
+        lines = dict.fromkeys(plan.product_index(rng, rng.choice((1, 1, 1, 2, 2, 3, 4))))
+        total = 0
+        for product in lines:
+            quantity = rng.choice((1, 1, 1, 1, 2, 2, 3))
+            total += plan.prices[product] * quantity
+            sales.append({
+                "order_id": order_id,
+                "product_id": plan.offsets["products"] + product,
+                "quantity": quantity,
+                "unit_price": plan.unit_prices[product],
+                "date": created_at,
+            })
+        orders.append({
+            "id": order_id,
+            "customer_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "customer_email": f"customer{rng.randrange(max(1, plan.args.orders // 3))}@example.com",
+            "total_amount": Decimal(total) / 100,
+            "created_at": created_at,
+        })
+    with engine.begin() as connection:
+        _insert(connection, models.Order, orders)
+        _insert(connection, models.Sale, sales)
+    return len(sales)
+
+
+def sales_batch(plan: Plan, rng, start: int, stop: int) -> int:
+    # Sales outside any order, e.g. point-of-sale
+    products = plan.product_index(rng, stop - start)
+    dates = plan.timestamps(rng, stop - start)
+    rows = [
+        {
+            "order_id": None,
+            "product_id": plan.offsets["products"] + product,
+            "quantity": rng.choice((1, 1, 1, 1, 2, 2, 3, 5)),
+            "unit_price": plan.unit_prices[product],
+            "date": sale_date,
+        }
+        for product, sale_date in zip(products, dates)
+    ]
+    with engine.begin() as connection:
+        _insert(connection, models.Sale, rows)
+    return len(rows)
+
+
+BATCHES = {
+    "categories": categories_batch,
+    "products": products_batch,
+    "orders": orders_batch,
+    "sales": sales_batch,
+}
+
+
+# ---------- Workers ----------
+
+_plan = None
+
+def _start_worker(args, offsets):
+    global _plan
+    # Connections inherited from the parent process must not be reused
+    engine.dispose(close=False)
+    _plan = Plan(args, offsets)
+
+def _run_batch(task) -> int:
+    table, index, start, stop = task
+    rng = random.Random(f"{_plan.args.seed}:{table}:{index}")
+    return BATCHES[table](_plan, rng, start, stop)
+
+
+def populate(table: str, count: int, args, pool) -> int:
+    if count <= 0:
+        return 0
+    started = time.perf_counter()
+    tasks = [
+        (table, index, start, min(start + args.batch_size, count))
+        for index, start in enumerate(range(0, count, args.batch_size))
+    ]
+    written = 0
+    for rows in pool.imap_unordered(_run_batch, tasks):
+        written += rows
+    seconds = time.perf_counter() - started
+    print(f"  {table:<10} {count:>12,} rows  {seconds:8.1f}s  {count / seconds:>10,.0f} rows/s")
+    return written
+
+
+def next_ids() -> dict:
+    # First free id per table, so new rows follow any existing data
+    with engine.connect() as connection:
+        return {
+            table: (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+            for table, model in (("categories", models.Category), ("products", models.Product), ("orders", models.Order))
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset (uses DATABASE_URL / DB_* settings)")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--sales", type=int, default=100000, help="Total sales, including order lines")
+    parser.add_argument("--years", type=float, default=2, help="Sales are spread over this many years")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today(), help="Last day of sales (YYYY-MM-DD)")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew exponent (0 = uniform)")
+    parser.add_argument("--growth", type=float, default=0.3, help="Year-on-year growth in sales volume")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per insert transaction")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel processes (SQLite always uses 1)")
+    parser.add_argument("--skip-rollups", action="store_true", help="Do not rebuild the daily revenue rollups")
+    args = parser.parse_args()
+    args.end_datetime = datetime.combine(args.end_date, datetime.min.time())
+    if args.categories < 1 or args.products < 1:
+        parser.error("--categories and --products must be at least 1")
+    if engine.dialect.name == "sqlite" and args.workers > 1:
+        print("SQLite allows one writer at a time; using 1 worker")
+        args.workers = 1
+
+    migrate.upgrade(engine)
+    offsets = next_ids()
+    started = time.perf_counter()
+    print(f"Generating with seed {args.seed} on {engine.dialect.name}, {args.workers} worker(s)")
+
+    with multiprocessing.Pool(args.workers, initializer=_start_worker, initargs=(args, offsets)) as pool:
+        populate("categories", args.categories, args, pool)
+        populate("products", args.products, args, pool)
+        order_lines = populate("orders", args.orders, args, pool)
+        populate("sales", args.sales - order_lines, args, pool)
+
+    if not args.skip_rollups:
+        rollups_started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            rebuild(db)
+        finally:
+            db.close()
+        print(f"  {'rollups':<10} {'':>12}       {time.perf_counter() - rollups_started:8.1f}s")
+
+    print(f"✅ Demo data successfully populated in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
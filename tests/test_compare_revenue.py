@@ -0,0 +1,45 @@
+import json
+import uuid
+
+from app.database import SessionLocal
+from app.models import models
+
+# Far from the seeded sales, so these are the only sales in the range
+FULL_DAY = "2001-03-10T12:00:00"
+PARTIAL_DAY = "2001-03-11T12:00:00"
+RANGE = "start_date=2001-03-10T00:00:00&end_date=2001-03-11T18:00:00"
+
+
+def import_product(client, sku: str, category_id: int) -> int:
+    row = {"sku": sku, "name": f"Compare {sku}", "price": 10, "category_id": category_id}
+    response = client.post("/products/import?format=ndjson", content=json.dumps(row))
+    assert response.status_code == 200, response.text
+    db = SessionLocal()
+    try:
+        return db.query(models.Product.id).filter(models.Product.sku == sku).scalar()
+    finally:
+        db.close()
+
+
+def test_moved_product_counts_towards_current_category(client, seeded):
+    db = SessionLocal()
+    try:
+        (old_id, old_name), (new_id, new_name) = db.query(models.Category.id, models.Category.name) \
+            .order_by(models.Category.id).limit(2).all()
+    finally:
+        db.close()
+    assert old_name != new_name
+
+    sku = f"COMPARE-{uuid.uuid4().hex[:8]}"
+    product_id = import_product(client, sku, old_id)
+    for sale_date in (FULL_DAY, PARTIAL_DAY):
+        response = client.post("/sales/", json={"product_id": product_id, "quantity": 2, "unit_price": 0, "date": sale_date})
+        assert response.status_code == 200, response.text
+    import_product(client, sku, new_id)
+
+    # The full day is read from the rollups and the partial day from raw sales
+    by_category = client.get(f"/sales/compare?group_by=category&{RANGE}").json()
+    assert {row["category"]: float(row["revenue"]) for row in by_category} == {new_name: 40.0}
+
+    by_product = client.get(f"/sales/compare?group_by=product&{RANGE}").json()
+    assert {row["product"]: float(row["revenue"]) for row in by_product} == {f"Compare {sku}": 40.0}
@@ -0,0 +1,35 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.export import pyarrow
+
+FIELDS = ["id", "product_name", "quantity"]
+
+
+def read_export(content: bytes, export_format: str) -> list:
+    if export_format == "csv":
+        return list(csv.DictReader(io.StringIO(content.decode())))
+    if export_format == "ndjson":
+        return [json.loads(line) for line in content.splitlines()]
+    import pyarrow.parquet
+    return pyarrow.parquet.read_table(io.BytesIO(content)).to_pylist()
+
+
+@pytest.mark.parametrize("export_format", [
+    "csv", "ndjson", pytest.param("parquet", marks=pytest.mark.skipif(pyarrow is None, reason="needs pyarrow")),
+])
+def test_sales_export_fields(client, seeded, export_format):
+    full = {row["id"]: row for row in read_export(client.get("/sales/export?format=ndjson").content, "ndjson")}
+    response = client.get(f"/sales/export?format={export_format}&fields={','.join(reversed(FIELDS))}")
+    assert response.status_code == 200, response.text
+    rows = read_export(response.content, export_format)
+
+    assert len(rows) == len(full)
+    for row in rows:
+        assert list(row) == FIELDS
+        expected = full[int(row["id"])]
+        # CSV values are all strings
+        assert {name: str(row[name]) for name in FIELDS} == {name: str(expected[name]) for name in FIELDS}
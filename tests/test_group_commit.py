@@ -0,0 +1,47 @@
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import SessionLocal
+from app.models import models
+from app.routers.sales import record_sale_batch
+from app.schemas import schemas
+
+
+def test_sale_batch_inserts_once(seeded):
+    db = SessionLocal()
+    try:
+        product_ids = [product_id for product_id, in db.query(models.Product.id).order_by(models.Product.id).limit(50)]
+        inventory = dict(db.query(models.Inventory.product_id, models.Inventory.quantity))
+    finally:
+        db.close()
+    in_stock = [product_id for product_id in product_ids if inventory.get(product_id, 0) > 0]
+    payloads = [schemas.SaleCreate(product_id=product_id, quantity=1, unit_price=0) for product_id in in_stock[:40]]
+    payloads.append(schemas.SaleCreate(product_id=10**9, quantity=1, unit_price=0))
+
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        results = record_sale_batch(payloads)
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+
+    assert [re.match(r"INSERT INTO sales\b", statement) is not None for statement in statements].count(True) == 1
+    assert isinstance(results[-1], HTTPException) and results[-1].status_code == 404
+
+    sales = results[:-1]
+    db = SessionLocal()
+    try:
+        stored = {sale.id: sale for sale in db.query(models.Sale).filter(models.Sale.id.in_([sale.id for sale in sales]))}
+    finally:
+        db.close()
+    assert len(stored) == len(sales)
+    for payload, sale in zip(payloads, sales):
+        assert stored[sale.id].product_id == payload.product_id == sale.product_id
+        assert stored[sale.id].quantity == sale.quantity == 1
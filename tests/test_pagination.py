@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.pagination import paginate
+
+# created_at is nullable; NULLs sort first ascending and last descending
+CREATED = [datetime(2024, 1, 2), None, datetime(2024, 1, 1), None, datetime(2024, 1, 2), None, datetime(2024, 1, 3)]
+
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine("sqlite://")
+    models.Category.__table__.create(engine)
+    models.Product.__table__.create(engine)
+    with Session(engine) as db:
+        db.execute(insert(models.Product.__table__), [
+            {"id": i, "name": f"Product {i}", "price": 1, "created_at": created}
+            for i, created in enumerate(CREATED, start=1)
+        ])
+        db.commit()
+        yield db
+
+
+def expected_ids(descending: bool) -> list:
+    rows = sorted(enumerate(CREATED, start=1), key=lambda row: (row[1] is not None, row[1] or datetime.min, row[0]))
+    return [row_id for row_id, _ in (reversed(rows) if descending else rows)]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_pages_through_null_sort_values(db, descending, limit):
+    ids, cursor = [], None
+    while True:
+        page = paginate(
+            db.query(models.Product),
+            sort_key="created_at",
+            sort_column=models.Product.created_at,
+            id_column=models.Product.id,
+            descending=descending,
+            limit=limit,
+            cursor=cursor
+        )
+        ids += [product.id for product in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == expected_ids(descending)
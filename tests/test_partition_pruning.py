@@ -0,0 +1,120 @@
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import engine
+from app.instrumentation import current_request_stats
+from app.partitions import explain_partitions, partitions, sales_between
+
+mysql_only = pytest.mark.skipif(engine.dialect.name != "mysql", reason="only MySQL partitions sales")
+
+
+# ---------- Query shapes ----------
+# Every way the app bounds sales by date goes through sales_between. Each
+# shape is (conditions, low, high): the rows it can match have low <= date
+# < high, where None is unbounded.
+
+def shapes(month: datetime, next_month: datetime) -> dict:
+    day = month + timedelta(days=14)
+    return {
+        "one month": (sales_between(month, next_month, end_exclusive=True), month, next_month),
+        "one day": (sales_between(day, day + timedelta(hours=23, minutes=59, seconds=59)), day, day + timedelta(days=1)),
+        "since a month": (sales_between(month), month, None),
+        "up to a month": (sales_between(end=next_month, end_exclusive=True), None, next_month),
+        "up to a time": (sales_between(end=day), None, day + timedelta(seconds=1)),
+    }
+
+
+def expected_partitions(bounds: list, low, high) -> set:
+    # Partitions whose [previous bound, bound) range overlaps [low, high)
+    names, lower = set(), None
+    for name, bound, _ in bounds:
+        if (high is None or lower is None or lower < high) and (low is None or bound is None or low < bound):
+            names.add(name)
+        lower = bound
+    return names
+
+
+# ---------- Pruning (MySQL) ----------
+
+@pytest.fixture(scope="module")
+def bounds() -> list:
+    with engine.connect() as connection:
+        bounds = partitions(connection)
+    if len([bound for _, bound, _ in bounds if bound is not None]) < 2:
+        pytest.fail("sales must have at least two monthly partitions")
+    return bounds
+
+
+@mysql_only
+@pytest.mark.parametrize("shape", list(shapes(datetime(2000, 1, 1), datetime(2000, 2, 1))))
+def test_sales_between_prunes(bounds, shape):
+    # The second partition is the first with a lower bound
+    month, next_month = bounds[0][1], bounds[1][1]
+    conditions, low, high = shapes(month, next_month)[shape]
+    with engine.connect() as connection:
+        read = set(filter(None, explain_partitions(connection, conditions).split(",")))
+    assert read == expected_partitions(bounds, low, high)
+
+
+# ---------- Endpoints ----------
+
+def sales_selects(client, url: str) -> list:
+    # SELECTs on sales the request ran (index loads excluded)
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if current_request_stats() is not None and re.search(r"\bFROM sales\b", statement):
+            statements.append((statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+    assert response.status_code == 200, response.text
+    assert statements, f"{url} did not read sales"
+    return statements
+
+
+def endpoint_urls(first_day: date) -> dict:
+    # url -> (low, high) for date-filtered endpoints over 20 days from
+    # `first_day`, with partial days at both ends
+    start = datetime.combine(first_day, datetime.min.time()) + timedelta(hours=6)
+    end = start + timedelta(days=20)
+    dates = f"start_date={start.isoformat()}&end_date={end.isoformat()}"
+    return {
+        f"/sales/?{dates}": (start, end + timedelta(seconds=1)),
+        f"/sales/export?format=ndjson&{dates}": (start, end + timedelta(seconds=1)),
+        f"/sales/compare?group_by=category&{dates}": (start, end + timedelta(seconds=1)),
+    }
+
+
+def test_endpoints_compare_bare_date_column(client, seeded):
+    # On every database: a function around sales.date would make MySQL read
+    # every partition
+    for url in endpoint_urls(date.fromisoformat(seeded["first_day"]) + timedelta(days=40)):
+        for statement, _ in sales_selects(client, url):
+            assert not re.search(r"\w\(\s*sales\.date\b", statement), f"{url}: {statement}"
+
+
+def test_sales_between_compares_bare_date_column():
+    for name, (conditions, _, _) in shapes(datetime(2000, 1, 1), datetime(2000, 2, 1)).items():
+        for condition in conditions:
+            sql = str(condition.compile(dialect=engine.dialect))
+            assert re.fullmatch(r"sales\.date (>=|<=|<) \S+", sql), f"{name}: {sql}"
+
+
+@mysql_only
+def test_endpoints_prune(client, seeded, bounds):
+    month = bounds[0][1].date()
+    for url, (low, high) in endpoint_urls(month).items():
+        expected = expected_partitions(bounds, low, high)
+        for statement, parameters in sales_selects(client, url):
+            with engine.connect() as connection:
+                rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+            read = {name for row in rows if row["table"] == "sales" for name in (row["partitions"] or "").split(",")}
+            assert read <= expected, f"{url} reads {sorted(read - expected)}"
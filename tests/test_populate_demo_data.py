@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+VOLUMES = {"categories": 5, "products": 40, "orders": 20, "sales": 100}
+
+
+def test_second_run_appends(tmp_path):
+    # A second run on the same database adds a full dataset after the first
+    path = tmp_path / "demo.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}"}
+    arguments = [f"--{table}={count}" for table, count in VOLUMES.items()]
+    for _ in range(2):
+        subprocess.run([sys.executable, "populate_demo_data.py", *arguments, "--years=0.2"],
+                       cwd=ROOT, env=env, check=True, capture_output=True)
+
+    connection = sqlite3.connect(path)
+    try:
+        for table, count in VOLUMES.items():
+            assert connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 2 * count, table
+        names = [name for name, in connection.execute("SELECT name FROM categories ORDER BY id")]
+        assert names[0] == "Electronics 1" and len(set(names)) == 2 * VOLUMES["categories"]
+    finally:
+        connection.close()
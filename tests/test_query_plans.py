@@ -0,0 +1,148 @@
+import re
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import engine
+from app.instrumentation import current_request_stats
+
+# Tables that grow with the business; none of them may be read in full
+LARGE_TABLES = {"products", "inventory", "sales", "orders", "sales_daily_product", "sales_daily_category"}
+
+
+# ---------- Query plans ----------
+# Runs the SELECTs an endpoint issued through EXPLAIN (QUERY PLAN on SQLite)
+# and reduces each plan to (table, access) pairs, where access is the index
+# read, "PRIMARY" for a primary key lookup, or None for a full table scan.
+
+@contextmanager
+def captured_selects():
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if current_request_stats() is not None and statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+
+
+def _table(name: str) -> str:
+    # Eager loads alias their tables as products_1, categories_1, ...
+    return re.sub(r"_\d+$", "", name)
+
+
+def plan(statement: str, parameters) -> list:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if engine.dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            accesses = []
+            for row in cursor.fetchall():
+                match = re.match(r"(SCAN|SEARCH) (\w+)(?: USING (?:COVERING )?INDEX (\w+)| USING INTEGER PRIMARY KEY)?",
+                                 row[3])
+                if match:
+                    access = match.group(3) or ("PRIMARY" if "PRIMARY KEY" in row[3] else None)
+                    accesses.append((_table(match.group(2)), access))
+            return accesses
+        cursor.execute("EXPLAIN " + statement, parameters)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [(_table(row["table"]), row["key"]) for row in rows if row["table"] and not row["table"].startswith("<")]
+    finally:
+        connection.close()
+
+
+def endpoint_plans(client, url: str) -> list:
+    with captured_selects() as statements:
+        response = client.get(url)
+    assert response.status_code == 200, response.text
+    return [access for statement, parameters in statements for access in plan(statement, parameters)]
+
+
+# ---------- List and analytics endpoints ----------
+
+def _range(seeded, days: int) -> tuple:
+    last = date.fromisoformat(seeded["last_day"]) - timedelta(days=30)
+    return last - timedelta(days=days), last
+
+
+CASES = [
+    # (name, url(seeded), table, indexes any of which satisfies the query)
+    ("products by created_at", lambda seeded: "/products/", "products", {"ix_products_created_at"}),
+    ("products by name", lambda seeded: "/products/?sort_by=name&sort_order=asc", "products", {"ix_products_name"}),
+    ("products by category and price",
+     lambda seeded: f"/products/?category_name={seeded['category_names'][0]}&min_price=10&max_price=50&sort_by=price",
+     "products", {"ix_products_category_id_price"}),
+    ("inventory by last_updated", lambda seeded: "/inventory/", "inventory", {"ix_inventory_last_updated"}),
+    ("inventory by quantity", lambda seeded: "/inventory/?sort_by=quantity&max_qty=10", "inventory",
+     {"ix_inventory_quantity"}),
+    ("sales by date", lambda seeded: "/sales/", "sales", {"ix_sales_date"}),
+    ("sales in a date range",
+     lambda seeded: "/sales/?start_date={}T00:00:00&end_date={}T00:00:00".format(*_range(seeded, 30)),
+     "sales", {"ix_sales_date"}),
+    ("orders by created_at", lambda seeded: "/orders/", "orders", {"ix_orders_created_at"}),
+    ("order lines of a page of orders", lambda seeded: "/orders/", "sales", {"ix_sales_order_id", "order_id"}),
+    ("revenue summary",
+     lambda seeded: "/sales/revenue-summary?range_type=monthly&start_date={}&end_date={}".format(*_range(seeded, 90)),
+     "sales_daily_product", {"sqlite_autoindex_sales_daily_product_1", "PRIMARY"}),
+    ("compare by product",
+     lambda seeded: "/sales/compare?group_by=product&start_date={}T06:00:00&end_date={}T18:00:00".format(*_range(seeded, 90)),
+     "sales", {"ix_sales_date"}),
+    ("compare by category, whole days",
+     lambda seeded: "/sales/compare?group_by=category&start_date={}T00:00:00&end_date={}T23:59:59".format(*_range(seeded, 90)),
+     "sales_daily_product", {"sqlite_autoindex_sales_daily_product_1", "PRIMARY"}),
+    ("sales export in a date range",
+     lambda seeded: "/sales/export?format=ndjson&start_date={}T00:00:00&end_date={}T00:00:00".format(*_range(seeded, 7)),
+     "sales", {"ix_sales_date"}),
+]
+
+
+@pytest.mark.parametrize("url, table, indexes", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_endpoint_uses_index(client, seeded, url, table, indexes):
+    accesses = endpoint_plans(client, url(seeded))
+    used = {access for accessed, access in accesses if accessed == table}
+    assert used & indexes, f"{table} read with {used or 'nothing'}, expected one of {indexes}"
+    scanned = {accessed for accessed, access in accesses if access is None and accessed in LARGE_TABLES}
+    assert not scanned, f"full scan of {', '.join(sorted(scanned))}"
+
+
+# ---------- Joins ----------
+# Products and categories are joined only when the response, a filter or the
+# sort reads them. The SQL is checked as well as the plan, since SQLite drops
+# an unused LEFT JOIN from the plan but MySQL still runs it.
+
+JOIN_CASES = [
+    # (url, tables the endpoint's SELECTs read)
+    ("/products/", {"products", "categories"}),
+    ("/products/?fields=id,name,price", {"products"}),
+    ("/products/?fields=id,category.name", {"products", "categories"}),
+    ("/products/?fields=id,name&category_name=El", {"products", "categories"}),
+    ("/inventory/", {"inventory", "products", "categories"}),
+    ("/inventory/?fields=product_id,quantity", {"inventory"}),
+    ("/inventory/?fields=quantity,product.name", {"inventory", "products"}),
+    ("/inventory/?fields=quantity&sort_by=product_name", {"inventory", "products"}),
+    ("/inventory/?fields=quantity&product_name=Pr", {"inventory", "products"}),
+    ("/sales/", {"sales", "products", "categories"}),
+    ("/sales/?fields=id,quantity,date", {"sales"}),
+    ("/sales/export?format=ndjson&fields=id,date,quantity", {"sales"}),
+    ("/sales/export?format=ndjson&fields=id,product_name", {"sales", "products"}),
+]
+
+
+@pytest.mark.parametrize("url, tables", JOIN_CASES)
+def test_endpoint_joins(client, seeded, url, tables):
+    with captured_selects() as statements:
+        response = client.get(url)
+    assert response.status_code == 200, response.text
+    named = {_table(name) for statement, _ in statements for name in re.findall(r"\b(?:FROM|JOIN) (\w+)", statement)}
+    assert named == tables
+    accesses = [access for statement, parameters in statements for access in plan(statement, parameters)]
+    assert {table for table, access in accesses} == tables